@@ -0,0 +1,233 @@
+"""
+Benchmarks de src.utils.metrics, src.utils.data_loader y src.utils.rebalance sobre datos sintéticos.
+
+Cada escala amplía el dataset actual (29 activos, 686 días, 3 benchmarks) en
+un eje. Los tiempos (mínimo y mediana de varias repeticiones) se guardan en un
+JSON que sirve de baseline para comparar ejecuciones posteriores.
+
+Uso:
+    python -m benchmarks.run [--scales base,assets,history,benchmarks] [--repeat 5]
+                             [--out results.json] [--compare baseline.json] [--tolerance 1.3]
+
+Con --compare se imprime la razón actual/baseline de cada caso y el proceso
+termina con error si algún caso es más lento que baseline * tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_dataset
+from src.utils import data_loader as dl
+from src.utils import matrix_store
+from src.utils import metrics as m
+from src.utils import rebalance as rb
+
+# Escalas: (activos, días, benchmarks)
+SCALES = {
+    "base": (29, 686, 3),
+    "assets": (5000, 686, 3),
+    "history": (29, 30 * 252, 3),
+    "benchmarks": (29, 686, 100),
+}
+# Diferencias por debajo de este umbral (segundos) se consideran ruido al comparar
+NOISE_FLOOR = 0.002
+
+
+def _cold(load):
+    """Carga sin caché: vacía el almacén de data_loader antes de cada llamada."""
+    def run():
+        dl.clear_cache()
+        return load()
+    return run
+
+
+def loader_cases(paths):
+    ticker = paths["tickers"][0]
+    start = pd.read_csv(paths["portfolio"], usecols=["date"], parse_dates=["date"])["date"].iloc[-252]
+    cases = {
+        "load_portfolio_history": lambda: dl.load_portfolio_history(paths["portfolio"]),
+        "load_benchmarks": lambda: dl.load_benchmarks(paths["benchmarks"]),
+        "load_asset_allocation": lambda: dl.load_asset_allocation(paths["weights"]),
+        "load_asset_prices": lambda: dl.load_asset_prices(paths["prices"]),
+        "load_asset_prices[1y]": lambda: dl.load_asset_prices(paths["prices"], start=start),
+        "load_dashboard_general_data": lambda: dl.load_dashboard_general_data(paths["portfolio"], paths["benchmarks"], paths["weights"]),
+        "load_fundamentals": lambda: dl.load_fundamentals(paths["fundamentals"], ticker),
+        "load_technicals": lambda: dl.load_technicals(paths["technicals"], ticker),
+        "load_technicals[close,1y]": lambda: dl.load_technicals(paths["technicals"], ticker, columns=["close"], start=start),
+        # La carpeta de benchmarks (CSV date,value) hace de carpeta de mercados;
+        # sin panel guardado, en frío se construye a partir de los CSV
+        "load_macro_panel[D]": lambda: dl.load_macro_panel(paths["benchmarks"], "D"),
+        "load_macro_panel[M]": lambda: dl.load_macro_panel(paths["benchmarks"], "M"),
+    }
+    out = {}
+    for name, load in cases.items():
+        out[f"data_loader.{name}[cold]"] = _cold(load)
+        out[f"data_loader.{name}[warm]"] = load
+    out["data_loader.get_data_version"] = lambda: dl.get_data_version(paths["portfolio"], paths["benchmarks"], paths["weights"])
+    out["data_loader.clear_cache"] = dl.clear_cache
+    return out
+
+
+def matrix_cases(paths):
+    """load_matrix necesita el almacén binario: se genera una vez antes de medir."""
+    for key in ("prices", "weights"):
+        matrix_store.build_matrix_store(paths[key])
+    return {
+        "data_loader.load_matrix[cold]": _cold(lambda: dl.load_matrix(paths["prices"])),
+        "data_loader.load_asset_prices[mmap,cold]": _cold(lambda: dl.load_asset_prices(paths["prices"])),
+        "data_loader.load_asset_allocation[mmap,cold]": _cold(lambda: dl.load_asset_allocation(paths["weights"])),
+    }
+
+
+def metrics_cases(paths):
+    dl.clear_cache()
+    df = dl.load_portfolio_history(paths["portfolio"])
+    benchmarks = dl.load_benchmarks(paths["benchmarks"])
+    df_bench = next(iter(benchmarks.values()))
+    df_alloc = dl.load_asset_allocation(paths["weights"])
+    df_prices = dl.load_asset_prices(paths["prices"])
+    returns = m.get_daily_returns(df)
+    cutoff = df["date"].iloc[-1]
+    weights = df_alloc.drop(columns="date").iloc[-1].to_numpy()
+    values = m.build_value_matrix(df, benchmarks)
+    bench_name = next(iter(benchmarks))
+    bench_returns = pd.concat({k: b["retorno"] for k, b in benchmarks.items()}, axis=1)
+    long_prices = df_prices.melt(id_vars="date", var_name="asset", value_name="asset_value")
+    return {
+        "metrics.get_last_value": lambda: m.get_last_value(df),
+        "metrics.get_total_return": lambda: m.get_total_return(df),
+        "metrics.get_daily_returns": lambda: m.get_daily_returns(df),
+        "metrics.get_cumulative_return_series": lambda: m.get_cumulative_return_series(df),
+        "metrics.get_var": lambda: m.get_var(returns),
+        "metrics.get_best_and_worst_asset": lambda: m.get_best_and_worst_asset(long_prices),
+        "metrics.get_asset_table": lambda: m.get_asset_table(df_prices, df_alloc, cutoff),
+        "metrics.get_annualized_return": lambda: m.get_annualized_return(df),
+        "metrics.get_sharpe_ratio": lambda: m.get_sharpe_ratio(df),
+        "metrics.get_sortino_ratio": lambda: m.get_sortino_ratio(df),
+        "metrics.get_max_drawdown": lambda: m.get_max_drawdown(df),
+        "metrics.get_alpha_beta": lambda: m.get_alpha_beta(df, df_bench),
+        "metrics.get_turnover": lambda: m.get_turnover(df_alloc, cutoff),
+        "metrics.get_effective_n": lambda: m.get_effective_n(weights),
+        "metrics.get_kpis": lambda: m.get_kpis(df),
+        "metrics.compute_kpis": lambda: m.compute_kpis(df, df_bench=df_bench),
+        "metrics.build_value_matrix": lambda: m.build_value_matrix(df, benchmarks),
+        "metrics.compute_kpis_matrix": lambda: m.compute_kpis_matrix(values, bench=bench_name),
+        "metrics.get_compound_returns": lambda: m.get_compound_returns(bench_returns),
+        "metrics.get_transaction_table": lambda: m.get_transaction_table(df_alloc, df_prices),
+        "metrics.get_cash_series": lambda: m.get_cash_series(df_alloc),
+    }
+
+
+def rebalance_cases(paths, n_candidates=100):
+    """Rebalanceo de los pesos actuales hacia n_candidates objetivos aleatorios en una sola llamada."""
+    df_alloc = dl.load_asset_allocation(paths["weights"])
+    df_prices = dl.load_asset_prices(paths["prices"])
+    current = df_alloc.drop(columns="date").iloc[-1].astype(float)
+    rng = np.random.default_rng(0)
+    targets = pd.DataFrame(rng.dirichlet(np.ones(len(current)), size=n_candidates), columns=current.index)
+    prices = rb.prices_at(df_prices, df_prices["date"].iloc[-1], current.index)
+    return {
+        "rebalance.prices_at": lambda: rb.prices_at(df_prices, df_prices["date"].iloc[-1], current.index),
+        "rebalance.rebalance[1]": lambda: rb.rebalance(current, targets.iloc[0], prices, 1e6),
+        f"rebalance.rebalance[{n_candidates}]": lambda: rb.rebalance(current, targets, prices, 1e6, whole_shares=True).summary(),
+    }
+
+
+def time_case(fn, repeat):
+    """Mínimo y mediana (segundos) de `repeat` llamadas, tras una de calentamiento."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"min": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def run_scale(name, workdir, repeat, only=None):
+    n_assets, n_days, n_benchmarks = SCALES[name]
+    root = os.path.join(workdir, name)
+    paths = make_dataset(root, n_assets, n_days, n_benchmarks)
+    results = {}
+    for build in (loader_cases, matrix_cases, metrics_cases, rebalance_cases):
+        for case, fn in build(paths).items():
+            if only and only not in case:
+                continue
+            results[case] = time_case(fn, repeat)
+            print(f"  {case:<55} {results[case]['min'] * 1000:10.2f} ms")
+    dl.clear_cache()
+    shutil.rmtree(root, ignore_errors=True)
+    return {"shape": {"assets": n_assets, "days": n_days, "benchmarks": n_benchmarks}, "cases": results}
+
+
+def compare(current, baseline, tolerance):
+    """Imprime actual/baseline por caso y devuelve la lista de regresiones."""
+    regressions = []
+    for scale, res in current["scales"].items():
+        base_cases = baseline.get("scales", {}).get(scale, {}).get("cases", {})
+        for case, r in res["cases"].items():
+            if case not in base_cases:
+                continue
+            old, new = base_cases[case]["min"], r["min"]
+            ratio = new / old if old > 0 else float("inf")
+            slower = ratio > tolerance and new - old > NOISE_FLOOR
+            if slower:
+                regressions.append((scale, case, ratio))
+            print(f"{scale:<11} {case:<55} {ratio:6.2f}x{'  <-- regresión' if slower else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de metrics y data_loader con datos sintéticos.")
+    parser.add_argument("--scales", default=",".join(SCALES), help="Escalas separadas por comas")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="Solo los casos cuyo nombre contiene este texto")
+    parser.add_argument("--out", help="JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="JSON baseline con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=1.3)
+    args = parser.parse_args(argv)
+    # Mismo modo que el dashboard (ver portfolio_dashboard.py): los loaders en
+    # caliente devuelven copias perezosas en lugar de copias completas
+    pd.options.mode.copy_on_write = True
+
+    current = {
+        "meta": {
+            "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "scales": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="dashboards-bench-")
+    try:
+        for scale in args.scales.split(","):
+            print(f"[{scale}] activos={SCALES[scale][0]} días={SCALES[scale][1]} benchmarks={SCALES[scale][2]}")
+            current["scales"][scale] = run_scale(scale, workdir, args.repeat, args.only)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Resultados en {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            sys.exit(f"{len(regressions)} caso(s) más lentos que baseline x{args.tolerance}")
+
+
+if __name__ == "__main__":
+    main()
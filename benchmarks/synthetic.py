@@ -0,0 +1,121 @@
+"""
+Generadores de datos sintéticos con el mismo formato que data/.
+
+Escalan los datasets actuales en tres ejes: número de activos, longitud del
+histórico (días hábiles) y número de benchmarks. Los precios son paseos
+log-normales, los pesos se rebalancean cada pocos días sobre un subconjunto de
+activos (para que haya transacciones) y todo es reproducible con `seed`.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# Columnas de data/tecnicals/<TICKER>.csv que lee el dashboard
+TECHNICALS_COLUMNS = ["open", "high", "low", "close", "volume", "macd", "adx", "rsi", "atr"]
+FUNDAMENTALS_COLUMNS = ["ROE_Adj", "Current_Ratio", "Debt_to_Equity", "EPS"]
+
+
+def tickers(n_assets):
+    return [f"T{i:04d}" for i in range(n_assets)]
+
+
+def business_days(n_days, end="2025-06-30"):
+    return pd.bdate_range(end=end, periods=n_days)
+
+
+def random_walk(rng, n_days, n_series, start=100.0, vol=0.015):
+    """Matriz n_days x n_series de precios log-normales."""
+    log_ret = rng.normal(0.0003, vol, size=(n_days, n_series))
+    log_ret[0] = 0.0
+    return start * np.exp(np.cumsum(log_ret, axis=0))
+
+
+def weights_matrix(rng, n_days, n_assets, rebalance_every=5, turnover=0.1):
+    """
+    Pesos (CASH + activos) que suman 1 en cada fecha. Cada `rebalance_every`
+    días se modifica una fracción `turnover` de los activos.
+    """
+    n = n_assets + 1
+    w = np.empty((n_days, n))
+    current = rng.dirichlet(np.ones(n))
+    for t in range(n_days):
+        if t and t % rebalance_every == 0:
+            k = max(1, int(n * turnover))
+            idx = rng.choice(n, size=k, replace=False)
+            current = current.copy()
+            current[idx] = rng.uniform(0, 2 / n, size=k)
+            current /= current.sum()
+        w[t] = current
+    return w
+
+
+def make_dataset(root, n_assets=29, n_days=686, n_benchmarks=3, n_tickers_detail=3, seed=0):
+    """
+    Escribe en `root` un árbol como data/: portfolio_history.csv,
+    asset_prices.csv, asset_allocation.csv, benchmarks/*.csv y técnicos y
+    fundamentales de los primeros `n_tickers_detail` activos. Devuelve un dict
+    con las rutas y los tickers.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(root, exist_ok=True)
+    dates = business_days(n_days)
+    names = tickers(n_assets)
+    paths = {
+        "root": root,
+        "portfolio": os.path.join(root, "portfolio_history.csv"),
+        "prices": os.path.join(root, "asset_prices.csv"),
+        "weights": os.path.join(root, "asset_allocation.csv"),
+        "benchmarks": os.path.join(root, "benchmarks"),
+        "technicals": os.path.join(root, "tecnicals"),
+        "fundamentals": os.path.join(root, "fundamentals"),
+        "tickers": names,
+    }
+
+    prices = random_walk(rng, n_days, n_assets)
+    df_prices = pd.DataFrame(prices, columns=names)
+    df_prices.insert(0, "date", dates)
+    df_prices.to_csv(paths["prices"], index=False)
+
+    weights = weights_matrix(rng, n_days, n_assets)
+    df_alloc = pd.DataFrame(weights, columns=["CASH"] + names)
+    df_alloc.insert(0, "date", dates)
+    df_alloc.to_csv(paths["weights"], index=False)
+
+    # Valor de la cartera con los pesos del día anterior (CASH no rinde)
+    asset_ret = np.vstack([np.zeros(n_assets), prices[1:] / prices[:-1] - 1])
+    port_ret = (weights[:-1, 1:] * asset_ret[1:]).sum(axis=1)
+    value = 1000 * np.concatenate(([1.0], np.cumprod(1 + port_ret)))
+    pd.DataFrame({"date": dates, "portfolio_value": value}).to_csv(paths["portfolio"], index=False)
+
+    os.makedirs(paths["benchmarks"], exist_ok=True)
+    bench = random_walk(rng, n_days, n_benchmarks, start=1000.0, vol=0.01)
+    for j in range(n_benchmarks):
+        pd.DataFrame({
+            "date": dates,
+            "retorno": np.concatenate(([0.0], bench[1:, j] / bench[:-1, j] - 1)),
+            "value": bench[:, j],
+        }).to_csv(os.path.join(paths["benchmarks"], f"bench{j:03d}.csv"), index=False)
+
+    os.makedirs(paths["technicals"], exist_ok=True)
+    os.makedirs(paths["fundamentals"], exist_ok=True)
+    quarters = pd.date_range(end=dates[-1], periods=max(n_days // 63, 2), freq="QE")
+    for j, ticker in enumerate(names[:n_tickers_detail]):
+        close = prices[:, j]
+        df_tech = pd.DataFrame({
+            "date": dates,
+            "open": close * (1 + rng.normal(0, 0.003, n_days)),
+            "high": close * 1.01,
+            "low": close * 0.99,
+            "close": close,
+            "volume": rng.integers(10**5, 10**7, n_days),
+            "macd": rng.normal(0, 1, n_days),
+            "adx": rng.uniform(0, 60, n_days),
+            "rsi": rng.uniform(0, 100, n_days),
+            "atr": rng.uniform(0.5, 3, n_days),
+        })
+        df_tech.to_csv(os.path.join(paths["technicals"], f"{ticker}.csv"), index=False)
+        df_fund = pd.DataFrame(rng.uniform(0, 3, (len(quarters), len(FUNDAMENTALS_COLUMNS))), columns=FUNDAMENTALS_COLUMNS)
+        df_fund.insert(0, "date", quarters)
+        df_fund.to_csv(os.path.join(paths["fundamentals"], f"{ticker}_fundamentales.csv"), index=False)
+    return paths
@@ -9,6 +9,8 @@ FUNDAMENTALS_PATH = "C:/Users/marco/Desktop/Cede/estudios/UNIR/TFM/Desarrollo/da
 TECNICALS_PATH = "C:/Users/marco/Desktop/Cede/estudios/UNIR/TFM/Desarrollo/dashboards/data/tecnicals"
 PRICES_PATH = "C:/Users/marco/Desktop/Cede/estudios/UNIR/TFM/Desarrollo/dashboards/data/asset_prices.csv"
 MARKETS_PATH = "C:/Users/marco/Desktop/Cede/estudios/UNIR/TFM/Desarrollo/dashboards/data/markets"
+KPI_STATE_PATH = "C:/Users/marco/Desktop/Cede/estudios/UNIR/TFM/Desarrollo/dashboards/data/kpi_state.json"
+CATALOG_PATH = "C:/Users/marco/Desktop/Cede/estudios/UNIR/TFM/Desarrollo/dashboards/data/asset_catalog.csv"
 
 CONFIDENCE_PATH = "C:/Users/marco/Desktop/Cede/estudios/UNIR/TFM/Desarrollo/dashboards/data/markets/CONFIDENCE.csv"
 CPI_PATH = "C:/Users/marco/Desktop/Cede/estudios/UNIR/TFM/Desarrollo/dashboards/data/markets/CPI.csv"
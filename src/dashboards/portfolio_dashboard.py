@@ -1,6 +1,7 @@
 # src/dashboards/portfolio_dashboard.py
 
 import streamlit as st
+import pandas as pd
 import sys
 from pathlib import Path
 
@@ -9,41 +10,41 @@ ROOT = Path(__file__).resolve().parents[2]  # Ajusta el número si cambias la pr
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 from config import FECHA_CORTE
-# --- Importa las vistas correctamente ---
-from src.dashboards.views import general, performance, recommendation, asset_summary, transactions, market_overview
+# --- Copy-on-write de pandas para toda la app ---
+# Los loaders comparten entre sesiones los DataFrames ya parseados y devuelven
+# copias perezosas: con copy-on-write, una vista que modifica su DataFrame
+# copia antes los datos afectados en lugar de alterar el almacén compartido.
+pd.options.mode.copy_on_write = True
+# --- Registro de vistas (cada módulo se importa solo al seleccionarlo) ---
+from src.dashboards.registry import VIEWS, IMPORT_TIMES, load_view
+from src.utils.profiling import start_run, end_run, stage, show_panel
 # --- Sidebar navegación ---
 st.sidebar.title("Portfolio Manager Demo")
 st.sidebar.caption("TFM • Marcos Cedenilla Bonet")
 st.sidebar.caption(f"FECHA: {FECHA_CORTE.strftime('%d/%m/%Y')}")
 st.sidebar.title("Menú de navegación")
 
-VIEWS = [
-    "Resumen General",
-    "Rendimiento & Métricas",
-    "Siguiente Movimiento",
-    "Resumen por Activo",
-    "Transacciones",
-    "Situación de Mercado"
-]
+selected_view = st.sidebar.selectbox("Selecciona una vista:", list(VIEWS))
 
-selected_view = st.sidebar.selectbox("Selecciona una vista:", VIEWS)
 
 
 
+# --- Instrumentación opcional (panel de rendimiento) ---
+perf_panel = st.sidebar.toggle("Panel de rendimiento", key="perf_panel")
+if perf_panel:
+    start_run(selected_view, trace_alloc=st.sidebar.checkbox("Medir memoria (tracemalloc)", key="perf_alloc"))
 
 # --- Router principal ---
-if selected_view == "Resumen General":
-    general.show()  # Llama a la función principal de la vista General
-elif selected_view == "Rendimiento & Métricas":
-    performance.show()
-elif selected_view == "Siguiente Movimiento":
-    recommendation.show()
-elif selected_view == "Resumen por Activo":
-    asset_summary.show()
-elif selected_view == "Transacciones":
-    transactions.show()
-elif selected_view == "Situación de Mercado":
-    market_overview.show()
+# end_run en finally: si la vista falla o Streamlit corta el script (st.stop,
+# rerun) la muestra se cierra igual y tracemalloc no queda activo
+try:
+    with stage("importación vista"):
+        view = load_view(selected_view)
+    view.show()
+finally:
+    sample = end_run()
+if perf_panel:
+    show_panel(sample, selected_view, IMPORT_TIMES)
 
 st.sidebar.markdown("---")
 st.sidebar.markdown(
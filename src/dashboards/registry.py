@@ -0,0 +1,84 @@
+"""
+Registro de vistas del dashboard.
+
+Cada vista se declara por el nombre de su módulo y solo se importa cuando se
+selecciona por primera vez, de modo que un proceso recién arrancado carga
+únicamente la vista activa y sus dependencias (plotly, loaders...). El tiempo
+de esa primera importación queda en IMPORT_TIMES.
+
+Perfil de importación de cada vista (en procesos limpios); con --budget
+termina con error si alguna vista supera ese tiempo de importación:
+    python -m src.dashboards.registry [--top N] [--budget MS]
+"""
+import importlib
+import re
+import subprocess
+import sys
+import time
+
+VIEWS = {
+    "Resumen General": "src.dashboards.views.general",
+    "Rendimiento & Métricas": "src.dashboards.views.performance",
+    "Siguiente Movimiento": "src.dashboards.views.recommendation",
+    "Resumen por Activo": "src.dashboards.views.asset_summary",
+    "Transacciones": "src.dashboards.views.transactions",
+    "Situación de Mercado": "src.dashboards.views.market_overview",
+}
+
+# Segundos que tardó la primera importación de cada vista en este proceso
+IMPORT_TIMES = {}
+
+
+def load_view(name):
+    """Módulo de la vista `name`, importándolo la primera vez que se pide."""
+    module_name = VIEWS[name]
+    module = sys.modules.get(module_name)
+    if module is None:
+        t0 = time.perf_counter()
+        module = importlib.import_module(module_name)
+        IMPORT_TIMES[name] = time.perf_counter() - t0
+    return module
+
+
+# --- Perfil de importación ---
+# Base que el script principal importa siempre antes de resolver la vista
+BASE_IMPORTS = "import streamlit, config"
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def profile_view(module_name, top=5):
+    """
+    Importa la vista en un intérprete limpio con -X importtime, con la base ya
+    cargada, y devuelve (segundos acumulados, [(módulo, segundos propios)...]).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{BASE_IMPORTS}\nimport {module_name}"],
+        capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME_LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)) / 1e6, int(m.group(2)) / 1e6))
+    # Las líneas de la vista van después de la última importación de la base
+    base_end = max(i for i, r in enumerate(rows) if r[0] in ("streamlit", "config"))
+    rows = rows[base_end + 1:]
+    total = next((cum for name, _, cum in rows if name == module_name), 0.0)
+    heaviest = sorted(((name, own) for name, own, _ in rows), key=lambda r: r[1], reverse=True)
+    return total, heaviest[:top]
+
+
+if __name__ == "__main__":
+    top = int(sys.argv[sys.argv.index("--top") + 1]) if "--top" in sys.argv else 5
+    budget = float(sys.argv[sys.argv.index("--budget") + 1]) if "--budget" in sys.argv else None
+    over = []
+    for name, module_name in VIEWS.items():
+        total, heaviest = profile_view(module_name, top)
+        flag = "  <-- excede el presupuesto" if budget is not None and total * 1000 > budget else ""
+        if flag:
+            over.append(name)
+        print(f"{name:<24} {total * 1000:8.1f} ms{flag}")
+        for mod, own in heaviest:
+            print(f"    {mod:<40} {own * 1000:7.1f} ms")
+    if over:
+        sys.exit(f"{len(over)} vista(s) por encima de {budget:.0f} ms: {', '.join(over)}")
@@ -4,10 +4,14 @@ import plotly.express as px
 from src.utils.data_loader import (
     load_fundamentals,
     load_technicals,
-    load_asset_allocation
+    load_asset_allocation,
+    load_asset_prices
 )
-from src.utils.metrics import get_max_drawdown
-from config import FUNDAMENTALS_PATH, TECNICALS_PATH, WEIGHTS_PATH, FECHA_CORTE, FECHA_INICIO
+from src.utils.catalog import load_catalog, available_tickers, missing_datasets
+from src.utils.metrics import get_max_drawdown, get_asset_table
+from src.utils.downsampling import downsample
+from src.utils.profiling import stage, plotly_chart
+from config import FUNDAMENTALS_PATH, TECNICALS_PATH, WEIGHTS_PATH, PRICES_PATH, CATALOG_PATH, FECHA_CORTE, FECHA_INICIO
 
 # ----- Diccionarios para nombres y descripciones -----
 FUNDAMENTALS_VARS = {
@@ -32,6 +36,8 @@ TECHNICALS_VARS = {
     "high": ("High", "Precio máximo sesión/día."),
     "low": ("Low", "Precio mínimo sesión/día."),
 }
+# Columnas de técnicos que usa la vista (proyección al leer)
+TECHNICALS_COLUMNS = ["close"] + list(TECHNICALS_VARS)
 
 # ----- Helper visual/tooltip -----
 def info(texto):
@@ -87,16 +93,17 @@ def resumen_ejecutivo(last_fund, last_tech, price, weight, per):
         resumen_txt = " • ".join(resumen)
     return f"**Resumen ejecutivo:** {resumen_txt}"
 
-def select_asset():
-    import os
-    fundamentals_files = os.listdir(FUNDAMENTALS_PATH)
-    tickers = [f.split("_")[0] for f in fundamentals_files if f.endswith(".csv")]
-    ticker = st.selectbox("Selecciona activo", sorted(tickers))
+def select_asset(catalog):
+    # Solo los tickers con fundamentales y técnicos; el resto se avisa antes de leer
+    ticker = st.selectbox("Selecciona activo", available_tickers(catalog))
+    incompletos = catalog.index[catalog["fundamentals"] & ~catalog["technicals"]].tolist()
+    if incompletos:
+        st.caption(f"Sin datos técnicos (no disponibles): {', '.join(incompletos)}")
     return ticker
 
 def load_data(ticker):
     df_fund = load_fundamentals(FUNDAMENTALS_PATH, ticker)
-    df_tech = load_technicals(TECNICALS_PATH, ticker)
+    df_tech = load_technicals(TECNICALS_PATH, ticker, columns=TECHNICALS_COLUMNS)
     df_alloc = load_asset_allocation(WEIGHTS_PATH)
     return df_fund, df_tech, df_alloc
 
@@ -191,10 +198,11 @@ def show_technical_kpis(last_tech, prev_tech):
 def show_graphs(df_tech, ticker, df_alloc):
     # Sparkline precio cierre (gráfico bajo)
     st.markdown("##### Histórico de precio de cierre")
-    fig_price = px.line(df_tech, x="date", y="close", title="", height=160)
-    fig_price.update_traces(line=dict(width=2))
-    fig_price.update_layout(margin=dict(l=10, r=10, t=10, b=30), xaxis_title=None, yaxis_title=None)
-    st.plotly_chart(fig_price, use_container_width=True)
+    with stage("figura"):
+        fig_price = px.line(downsample(df_tech, "date", "close"), x="date", y="close", title="", height=160)
+        fig_price.update_traces(line=dict(width=2))
+        fig_price.update_layout(margin=dict(l=10, r=10, t=10, b=30), xaxis_title=None, yaxis_title=None)
+    plotly_chart(fig_price, use_container_width=True)
 
     # Sparkline peso en cartera
     if "asset" in df_alloc.columns and "weight" in df_alloc.columns:
@@ -203,15 +211,38 @@ def show_graphs(df_tech, ticker, df_alloc):
     else:
         df_alloc_ticker = df_alloc[["date", ticker]].rename(columns={ticker: "weight"})
     st.markdown("##### Histórico de peso en cartera")
-    fig_weight = px.line(df_alloc_ticker, x="date", y="weight", title="", height=120)
-    fig_weight.update_traces(line=dict(width=2, color="#bbb"))
-    fig_weight.update_layout(margin=dict(l=10, r=10, t=10, b=20), xaxis_title=None, yaxis_title=None)
-    st.plotly_chart(fig_weight, use_container_width=True)
+    with stage("figura"):
+        fig_weight = px.line(downsample(df_alloc_ticker, "date", "weight"), x="date", y="weight", title="", height=120)
+        fig_weight.update_traces(line=dict(width=2, color="#bbb"))
+        fig_weight.update_layout(margin=dict(l=10, r=10, t=10, b=20), xaxis_title=None, yaxis_title=None)
+    plotly_chart(fig_weight, use_container_width=True)
+
+def show_asset_table(df_assets):
+    st.markdown("#### Comparativa de todos los activos")
+    df_show = (df_assets * 100).reset_index().rename(columns={
+        "asset": "Activo",
+        "total_return": "Rent. total (%)",
+        "annualized_return": "Rent. anualizada (%)",
+        "volatility": "Volatilidad (%)",
+        "max_drawdown": "Max Drawdown (%)",
+        "weight": "Peso actual (%)",
+    }).sort_values("Rent. total (%)", ascending=False)
+    st.dataframe(
+        df_show, hide_index=True, use_container_width=True,
+        column_config={c: st.column_config.NumberColumn(format="%.2f") for c in df_show.columns[1:]}
+    )
+    st.caption("Periodo desde el inicio hasta la fecha de corte. Pulsa en una columna para ordenar.")
 
 def vista_resumen_activo():
     st.title("Resumen por activo")
-    ticker = select_asset()
-    df_fund, df_tech, df_alloc = load_data(ticker)
+    catalog = load_catalog(CATALOG_PATH, FUNDAMENTALS_PATH, TECNICALS_PATH, PRICES_PATH)
+    ticker = select_asset(catalog)
+    if ticker is None:
+        st.warning("No hay ningún activo con fundamentales y técnicos.")
+        return
+    with stage("carga de datos"):
+        df_fund, df_tech, df_alloc = load_data(ticker)
+        df_prices = load_asset_prices(PRICES_PATH, start=FECHA_INICIO, end=FECHA_CORTE)
     last_fund = df_fund.iloc[-1]
     prev_fund = df_fund.iloc[-2] if len(df_fund) > 1 else None
     last_tech = df_tech.iloc[-1]
@@ -220,17 +251,21 @@ def vista_resumen_activo():
     weight = get_current_weight(ticker, df_alloc)
     eps = last_fund['EPS'] if 'EPS' in last_fund else None
     per = price / eps if eps and eps != 0 else None
-    # KPIs performance
-    precios = df_tech[['date', 'close']].copy()
-    precios['date'] = pd.to_datetime(precios['date'])
-    precios = precios[precios['date'] >= pd.to_datetime(FECHA_INICIO)]
-    precios = precios[precios['date'] <= pd.to_datetime(FECHA_CORTE)]
-    precios = precios.sort_values('date')
-    if len(precios) >= 2:
-        ret = (precios['close'].iloc[-1] / precios['close'].iloc[0]) - 1
-        mdd = get_max_drawdown(precios, col="close")
+    # KPIs performance de todos los activos a la vez (rango FECHA_INICIO..FECHA_CORTE)
+    with stage("métricas"):
+        df_assets = get_asset_table(df_prices, df_alloc, FECHA_CORTE)
+    # El catálogo indica si el activo tiene columna en asset_prices
+    if not missing_datasets(catalog, ticker, ["prices"]) and ticker in df_assets.index:
+        ret = df_assets.at[ticker, "total_return"]
+        mdd = df_assets.at[ticker, "max_drawdown"]
     else:
-        ret, mdd = None, None
+        # Activo sin columna en asset_prices: se usa su fichero de técnicos
+        precios = load_technicals(TECNICALS_PATH, ticker, columns=["close"], start=FECHA_INICIO, end=FECHA_CORTE)
+        if len(precios) >= 2:
+            ret = (precios['close'].iloc[-1] / precios['close'].iloc[0]) - 1
+            mdd = get_max_drawdown(precios, col="close")
+        else:
+            ret, mdd = None, None
     # ----------- Resumen ejecutivo arriba del todo ------------
     st.info(resumen_ejecutivo(last_fund, last_tech, price, weight, per))
     # ----------- Mega-card y métricas clave -------------------
@@ -241,6 +276,7 @@ def vista_resumen_activo():
         show_technical_kpis(last_tech, prev_tech)
     with cols[1]:
         show_graphs(df_tech, ticker, df_alloc)
+    show_asset_table(df_assets)
 
 def show():
     vista_resumen_activo()
@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-from src.utils.data_loader import load_portfolio_history, load_benchmarks, load_asset_allocation
-from src.utils.metrics import get_total_return, get_var
-from config import FECHA_CORTE, PORTFOLIO_HISTORY_PATH, BENCHMARKS_PATH, WEIGHTS_PATH
+from src.utils.data_loader import load_portfolio_history, load_benchmarks, load_asset_allocation, load_asset_prices, get_data_version
+from src.utils.metrics import get_total_return, get_compound_returns
+from src.utils.risk import horizon_var_cvar, portfolio_returns_from_assets
+from src.utils.downsampling import downsample
+from src.utils.figure_cache import cached_figure
+from src.utils.profiling import stage, plotly_chart
+from src.utils.periods import build_period_indexes
+from config import FECHA_CORTE, PORTFOLIO_HISTORY_PATH, BENCHMARKS_PATH, WEIGHTS_PATH, PRICES_PATH
 
 # ---------- Header + periodo ----------
 def show_header_and_periodo(periodos, default):
@@ -16,12 +20,18 @@ def show_header_and_periodo(periodos, default):
     return periodo, periodos[periodo]
 
 # ---------- Resumen Textual ----------
-def show_resumen(df_period, df_benchmarks_period):
+def get_benchmark_returns(df_benchmarks_period):
+    """Rentabilidad acumulada del periodo para todos los benchmarks en una sola operación."""
+    if not df_benchmarks_period:
+        return {}
+    retornos = pd.concat({nombre: df['retorno'] for nombre, df in df_benchmarks_period.items()}, axis=1)
+    return dict(zip(retornos.columns, get_compound_returns(retornos)))
+
+def show_resumen(df_period, ret_benchmarks):
     ret_cartera = get_total_return(df_period)
     best = None
     max_bench = -1
-    for nombre, df_bench in df_benchmarks_period.items():
-        ret = (1 + df_bench['retorno']).prod() - 1
+    for nombre, ret in ret_benchmarks.items():
         if ret > max_bench:
             max_bench = ret
             best = nombre
@@ -42,9 +52,9 @@ def show_resumen(df_period, df_benchmarks_period):
     st.markdown(text, unsafe_allow_html=True)
 
 # ---------- KPIs rentabilidad ----------
-def show_kpis(df_period, df_benchmarks_period, max_benchmarks=3):
+def show_kpis(df_period, ret_benchmarks, max_benchmarks=3):
     st.markdown("<b>Rentabilidad acumulada</b>", unsafe_allow_html=True)
-    all_cols = st.columns(1 + min(len(df_benchmarks_period), max_benchmarks))
+    all_cols = st.columns(1 + min(len(ret_benchmarks), max_benchmarks))
     # Cartera principal
     ret = get_total_return(df_period)
     color = "green" if ret >= 0 else "red"
@@ -55,10 +65,9 @@ def show_kpis(df_period, df_benchmarks_period, max_benchmarks=3):
         </div>
         """, unsafe_allow_html=True)
     # Benchmarks destacados
-    for i, (nombre, df_bench) in enumerate(df_benchmarks_period.items()):
+    for i, (nombre, ret_bench) in enumerate(ret_benchmarks.items()):
         if i >= max_benchmarks:
             break
-        ret_bench = (1 + df_bench['retorno']).prod() - 1
         color = "green" if ret_bench >= 0 else "red"
         all_cols[i+1].markdown(f"""
             <div style="background:#F9F9F9;border-radius:8px;padding:18px 10px;text-align:center;box-shadow:0 2px 8px #ddd;">
@@ -67,11 +76,10 @@ def show_kpis(df_period, df_benchmarks_period, max_benchmarks=3):
             </div>
             """, unsafe_allow_html=True)
     # Botón para ver todos si hay más
-    if len(df_benchmarks_period) > max_benchmarks:
+    if len(ret_benchmarks) > max_benchmarks:
         if st.button("Ver todos los benchmarks"):
-            extra_cols = st.columns(len(df_benchmarks_period) - max_benchmarks)
-            for i, (nombre, df_bench) in enumerate(list(df_benchmarks_period.items())[max_benchmarks:]):
-                ret_bench = (1 + df_bench['retorno']).prod() - 1
+            extra_cols = st.columns(len(ret_benchmarks) - max_benchmarks)
+            for i, (nombre, ret_bench) in enumerate(list(ret_benchmarks.items())[max_benchmarks:]):
                 color = "green" if ret_bench >= 0 else "red"
                 extra_cols[i].markdown(f"""
                     <div style="background:#F9F9F9;border-radius:8px;padding:18px 10px;text-align:center;box-shadow:0 2px 8px #ddd;">
@@ -92,44 +100,89 @@ def show_valor_historico(df_period, df_benchmarks_period, n_dias):
     titulo = titulos.get(n_dias, "Histórico de valor: Cartera vs Benchmarks")
     with st.container():
         st.markdown(f"<div style='margin-bottom:-1rem;'><b>{titulo}</b></div>", unsafe_allow_html=True)
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=df_period["date"], y=df_period["portfolio_value"],
-            mode="lines", name="Cartera", line=dict(width=2, color="#0050b3")
-        ))
-        for nombre, df_bench in df_benchmarks_period.items():
-            if "value" in df_bench.columns:
-                fig.add_trace(go.Scatter(
-                    x=df_bench["date"], y=df_bench["value"],
-                    mode="lines", name=nombre
-                ))
-        fig.update_layout(
-            xaxis_title="Fecha", yaxis_title="Valor cartera",
-            legend=dict(orientation="h", x=0.01, y=1.12, font=dict(size=13)),
-            margin=dict(l=20, r=20, t=40, b=20), height=370,
-            plot_bgcolor="#FAFAFA"
+        fig = cached_figure(
+            "general_valor", (n_dias,), get_data_version(PORTFOLIO_HISTORY_PATH, BENCHMARKS_PATH),
+            lambda: build_valor_historico_figure(df_period, df_benchmarks_period)
         )
-        st.plotly_chart(fig, use_container_width=True)
-
-def show_var_gauge(df_portfolio):
-    returns_hist = df_portfolio[df_portfolio['date'] <= FECHA_CORTE]['portfolio_value'].pct_change().dropna()
-    var_95_d = abs(get_var(returns_hist, alpha=0.05)) * 100
-    var_95_m = abs(var_95_d * (21 ** 0.5))
-    var_95_y = abs(var_95_d * (252 ** 0.5))
-    periodos = {"1 día": var_95_d, "1 mes": var_95_m, "1 año": var_95_y}
-    periodo = st.selectbox("Periodo VaR 95% de Confianza", list(periodos.keys()), key="periodo_var")
-    valor = periodos[periodo]
+        plotly_chart(fig, use_container_width=True)
+
+def build_valor_historico_figure(df_period, df_benchmarks_period):
+    fig = go.Figure()
+    df_plot = downsample(df_period, "date", "portfolio_value")
+    fig.add_trace(go.Scatter(
+        x=df_plot["date"], y=df_plot["portfolio_value"],
+        mode="lines", name="Cartera", line=dict(width=2, color="#0050b3")
+    ))
+    for nombre, df_bench in df_benchmarks_period.items():
+        if "value" in df_bench.columns:
+            df_plot = downsample(df_bench, "date", "value")
+            fig.add_trace(go.Scatter(
+                x=df_plot["date"], y=df_plot["value"],
+                mode="lines", name=nombre
+            ))
+    fig.update_layout(
+        xaxis_title="Fecha", yaxis_title="Valor cartera",
+        legend=dict(orientation="h", x=0.01, y=1.12, font=dict(size=13)),
+        margin=dict(l=20, r=20, t=40, b=20), height=370,
+        plot_bgcolor="#FAFAFA"
+    )
+    return fig
+
+# Horizontes del VaR en días hábiles y origen de los retornos simulados
+VAR_HORIZONTES = {"1 día": 1, "1 mes": 21, "1 año": 252}
+VAR_METODOS = {
+    "Histórico de la cartera": "cartera",
+    "Pesos actuales (activos)": "activos",
+}
+VAR_CONFIANZA = 0.95
+
+def get_var_returns(df_portfolio, df_alloc, metodo):
+    """Retornos diarios hasta la fecha de corte que alimentan la simulación del VaR."""
+    if metodo == "activos":
+        df_prices = load_asset_prices(PRICES_PATH, end=FECHA_CORTE)
+        pesos = df_alloc[df_alloc['date'] <= FECHA_CORTE].sort_values('date').iloc[-1].drop('date')
+        return portfolio_returns_from_assets(df_prices, pesos)
+    return df_portfolio[df_portfolio['date'] <= FECHA_CORTE]['portfolio_value'].pct_change().dropna()
+
+def show_var_gauge(df_portfolio, df_alloc):
+    col1, col2 = st.columns(2)
+    with col1:
+        periodo = st.selectbox("Periodo VaR 95% de Confianza", list(VAR_HORIZONTES.keys()), key="periodo_var")
+    with col2:
+        metodo = VAR_METODOS[st.selectbox(
+            "Simulación", list(VAR_METODOS.keys()), key="metodo_var",
+            help="Block bootstrap de los retornos diarios históricos de la cartera, o de los retornos "
+                 "conjuntos de los activos con los pesos actuales (CASH rinde 0)."
+        )]
+    paths = [PORTFOLIO_HISTORY_PATH] if metodo == "cartera" else [PRICES_PATH, WEIGHTS_PATH]
+    version = get_data_version(*paths)
+    with stage("métricas"):
+        var, cvar = horizon_var_cvar(
+            lambda: get_var_returns(df_portfolio, df_alloc, metodo), VAR_HORIZONTES[periodo],
+            VAR_CONFIANZA, key=(FECHA_CORTE, version, metodo)
+        )
+    valor = abs(var) * 100
     # Badge
     if valor < 3:
         badge = "🟢"
-        color_gauge = "#2ecc71"
     elif valor < 7:
         badge = "🟡"
-        color_gauge = "#f1c40f"
     else:
         badge = "🔴"
-        color_gauge = "#e74c3c"
-    # Gauge
+    fig = cached_figure(
+        "general_var", (periodo, metodo), version,
+        lambda: build_var_gauge(valor, periodo)
+    )
+    plotly_chart(fig, use_container_width=True)
+    st.markdown(
+        f"<div style='font-size:2rem;display:flex;align-items:center;justify-content:center;'><b>{valor:.2f}%</b> {badge}</div>",
+        unsafe_allow_html=True)
+    st.caption(
+        f"El semicírculo representa la cartera. VaR ({badge}) indica la pérdida máxima esperada ({periodo}).\n"
+        f"CVaR (pérdida media en el 5% de peores escenarios): {abs(cvar) * 100:.2f}%. "
+        "🟢 bajo, 🟡 moderado, 🔴 alto.")
+
+def build_var_gauge(valor, periodo):
     fig = go.Figure(go.Indicator(
         mode="gauge+number",
         value=valor,
@@ -152,13 +205,7 @@ def show_var_gauge(df_portfolio):
         }
     ))
     fig.update_layout(height=250, margin=dict(t=14, b=0, l=2, r=2))
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown(
-        f"<div style='font-size:2rem;display:flex;align-items:center;justify-content:center;'><b>{valor:.2f}%</b> {badge}</div>",
-        unsafe_allow_html=True)
-    st.caption(
-        f"El semicírculo representa la cartera. VaR ({badge}) indica la pérdida máxima esperada ({periodo}).\n"
-        "🟢 bajo, 🟡 moderado, 🔴 alto.")
+    return fig
 
 # --- BLOQUE: Pesos actual con toggle top 10/todos y barras mejoradas ---
 def show_pesos_actuales(df_alloc):
@@ -181,6 +228,13 @@ def show_pesos_actuales(df_alloc):
     else:
         df_show = df_pesos
         height = 45 * len(df_pesos)
+    fig_bar = cached_figure(
+        "general_pesos", (show_all,), get_data_version(WEIGHTS_PATH),
+        lambda: build_pesos_figure(df_show, height)
+    )
+    plotly_chart(fig_bar, use_container_width=True)
+
+def build_pesos_figure(df_show, height):
     # Mejorar colores: solo top el más fuerte, el resto más claro
     colors = ["#0a2463"] + ["#dbeafe"] * (len(df_show) - 1)
     fig_bar = go.Figure()
@@ -200,39 +254,45 @@ def show_pesos_actuales(df_alloc):
         margin=dict(l=80, r=20, t=10, b=20), height=height,
         xaxis=dict(range=[0, df_show["Peso (%)"].max() * 1.15])
     )
-    st.plotly_chart(fig_bar, use_container_width=True)
+    return fig_bar
+
 # ---------- FUNCIÓN PRINCIPAL ----------
 
+# Índices de periodos por versión de los datos (se recalculan solo si cambian los CSV)
+_PERIOD_INDEXES = {}
+
+def get_period_indexes(periodos):
+    version = get_data_version(PORTFOLIO_HISTORY_PATH, BENCHMARKS_PATH)
+    if version not in _PERIOD_INDEXES:
+        _PERIOD_INDEXES.clear()
+        _PERIOD_INDEXES[version] = build_period_indexes(
+            load_portfolio_history(PORTFOLIO_HISTORY_PATH), load_benchmarks(BENCHMARKS_PATH),
+            FECHA_CORTE, periodos.values()
+        )
+    return _PERIOD_INDEXES[version]
+
 def vista_general():
     # --- Layout compacto y grid ---
     periodos = {"1 día": 1, "1 mes": 30, "1 año": 365, "Histórico": None}
     periodo, n_dias = show_header_and_periodo(periodos, default=3)
-    df_portfolio = load_portfolio_history(PORTFOLIO_HISTORY_PATH)
-    benchmarks = load_benchmarks(BENCHMARKS_PATH)
-    df_alloc = load_asset_allocation(WEIGHTS_PATH)
-    df_portfolio['date'] = pd.to_datetime(df_portfolio['date'])
-    df_period = df_portfolio[df_portfolio['date'] <= FECHA_CORTE].copy()
-    if n_dias is not None:
-        df_period = df_period.tail(n_dias)
-    df_period.reset_index(drop=True, inplace=True)
-    # Benchmarks
-    df_benchmarks_period = {}
-    for nombre, df_bench in benchmarks.items():
-        df_bench['date'] = pd.to_datetime(df_bench['date'])
-        bench_period = df_bench[df_bench['date'] <= FECHA_CORTE].copy()
-        if n_dias is not None:
-            bench_period = bench_period.tail(n_dias)
-        bench_period.reset_index(drop=True, inplace=True)
-        df_benchmarks_period[nombre] = bench_period
+    with stage("carga de datos"):
+        df_portfolio = load_portfolio_history(PORTFOLIO_HISTORY_PATH)
+        df_alloc = load_asset_allocation(WEIGHTS_PATH)
+        # Periodo seleccionado: vistas sobre los datos cargados, sin filtrar ni copiar
+        idx_portfolio, idx_benchmarks = get_period_indexes(periodos)
+        df_period = idx_portfolio.slice(n_dias)
+        df_benchmarks_period = {nombre: idx.slice(n_dias) for nombre, idx in idx_benchmarks.items()}
 
     # --------- GRID LAYOUT PRINCIPAL -------------
-    show_resumen(df_period, df_benchmarks_period)
-    show_kpis(df_period, df_benchmarks_period)
+    with stage("métricas"):
+        ret_benchmarks = get_benchmark_returns(df_benchmarks_period)
+    show_resumen(df_period, ret_benchmarks)
+    show_kpis(df_period, ret_benchmarks)
     st.markdown("<hr style='margin:10px 0 15px 0;'/>", unsafe_allow_html=True)
     cols = st.columns([2, 1])  # Izq: histórico+VaR, Der: pesos
     with cols[0]:
         show_valor_historico(df_period, df_benchmarks_period, n_dias)
-        show_var_gauge(df_portfolio)
+        show_var_gauge(df_portfolio, df_alloc)
     with cols[1]:
         show_pesos_actuales(df_alloc)
 
@@ -2,8 +2,13 @@ import streamlit as st
 import numpy as np
 import pandas as pd
 import plotly.express as px
-from src.utils.data_loader import load_benchmarks
-from config import MARKETS_PATH
+from src.utils.data_loader import load_benchmarks, load_macro_panel, load_portfolio_history, get_data_version
+from src.utils.downsampling import downsample
+from src.utils.figure_cache import cached_figure
+from src.utils.macro_index import MacroIndex
+from src.utils.macro_panel import correlation_with_returns, period_returns
+from src.utils.profiling import stage, plotly_chart
+from config import MARKETS_PATH, PORTFOLIO_HISTORY_PATH
 from datetime import timedelta
 
 # Define aquí si más es mejor (True) o peor (False) para cada KPI
@@ -41,25 +46,19 @@ TOOLTIPS_EXPLICATIVOS = {
 def info(texto):
     return f"<span style='color:#aaa;font-size:1em;vertical-align:middle;margin-left:5px' title='{texto}'>●</span>"
 
-def get_last_and_yoy(df, col_value=None):
-    col = col_value or [c for c in df.columns if c != "date"][0]
-    vals = df.sort_values("date")[["date", col]].dropna()
-    if len(vals) < 2:
-        return None, None, None
-    last_row = vals.iloc[-1]
-    last = last_row[col]
-    last_date = last_row["date"]
-    prev = vals.iloc[-2][col]
-    # YoY: busca dato 12 meses antes
-    vals["date"] = pd.to_datetime(vals["date"])
-    this_date = vals.iloc[-1]["date"]
-    prior = vals[vals["date"] <= this_date - timedelta(days=365)]
-    if len(prior) > 0:
-        yoy_val = prior.iloc[-1][col]
-        yoy = (last - yoy_val) / abs(yoy_val) * 100 if yoy_val != 0 else None
-    else:
-        yoy = None
-    return last, prev, yoy
+def get_last_and_yoy(index, key, col_value=None, as_of=None):
+    """(último, anterior, YoY %) del indicador a fecha `as_of` desde el índice precalculado."""
+    return index.last_and_yoy(key, col_value, as_of)
+
+_MACRO_INDEXES = {}
+
+def get_macro_index(macro_dict):
+    # Fechas ordenadas por serie: se construye una vez por versión de los datos
+    version = get_data_version(MARKETS_PATH)
+    if version not in _MACRO_INDEXES:
+        _MACRO_INDEXES.clear()
+        _MACRO_INDEXES[version] = MacroIndex(macro_dict)
+    return _MACRO_INDEXES[version]
 
 def trend_icon(val, key=None):
     sentido_positivo = METRIC_POSITIVE_TREND.get(key, True)
@@ -154,14 +153,14 @@ def filtra_periodo(df, periodo):
         return df
     return df[df["date"] >= fecha_ini]
 
-def market_summary_yoy(macro_dict):
+def market_summary_yoy(index, as_of=None):
     # Breve resumen ejecutivo con valores YoY principales (ejemplo)
     try:
-        gdp, _, yoy_gdp = get_last_and_yoy(macro_dict["PIB"], "GDP")
-        cpi, _, yoy_cpi = get_last_and_yoy(macro_dict["CPI"])
-        unemp, _, yoy_unemp = get_last_and_yoy(macro_dict.get("UNRATE", macro_dict.get("TASADES")))
-        vix, _, yoy_vix = get_last_and_yoy(macro_dict["VIXCLS"])
-        oil, _, yoy_oil = get_last_and_yoy(macro_dict["OIL"])
+        gdp, _, yoy_gdp = get_last_and_yoy(index, "PIB", "GDP", as_of)
+        cpi, _, yoy_cpi = get_last_and_yoy(index, "CPI", as_of=as_of)
+        unemp, _, yoy_unemp = get_last_and_yoy(index, "UNRATE" if "UNRATE" in index else "TASADES", as_of=as_of)
+        vix, _, yoy_vix = get_last_and_yoy(index, "VIXCLS", as_of=as_of)
+        oil, _, yoy_oil = get_last_and_yoy(index, "OIL", as_of=as_of)
         resumen = (
             "<b>YoY = Cambio Anual</b><br> "
             f"<b>PIB</b> {gdp:,.0f} (<b>{yoy_gdp:+.2f}%</b> YoY), "
@@ -190,12 +189,29 @@ PRETTY_TABS = {
 
 def vista_market():
     st.title("Situación y evolución del mercado")
-    macro_dict = load_benchmarks(MARKETS_PATH)
+    with stage("carga de datos"):
+        macro_dict = load_benchmarks(MARKETS_PATH)
+        index = get_macro_index(macro_dict)
+
+    # --- FECHA DE REFERENCIA ---
+    # Por defecto, el último dato disponible; cualquier fecha anterior muestra
+    # los KPIs tal y como estaban ese día
+    fecha_min, fecha_max = index.date_range()
+    as_of = None
+    if fecha_max is not None:
+        fecha = st.date_input(
+            "Datos a fecha", value=fecha_max.date(), min_value=fecha_min.date(), max_value=fecha_max.date(),
+            key="macro_as_of", help="Muestra los indicadores con los datos disponibles en esa fecha."
+        )
+        if pd.Timestamp(fecha) < fecha_max.normalize():
+            as_of = pd.Timestamp(fecha)
 
     # --- RESUMEN EJECUTIVO ---
+    with stage("métricas"):
+        resumen = market_summary_yoy(index, as_of)
     st.markdown(
         f"<div style='padding:0.7em 1em;background:#f7f8fb;border-radius:10px;margin-bottom:1.2em;font-size:1.13em;'>"
-        f"{market_summary_yoy(macro_dict)}"
+        f"{resumen}"
         f"</div>",
         unsafe_allow_html=True,
     )
@@ -208,8 +224,7 @@ def vista_market():
             if key not in macro_dict:
                 cols[i].markdown(f"<span style='color:#888'>{pretty}</span>", unsafe_allow_html=True)
                 continue
-            df = macro_dict[key]
-            last, prev, yoy = get_last_and_yoy(df, col_value)
+            last, prev, yoy = get_last_and_yoy(index, key, col_value, as_of)
             if last is None:
                 cols[i].markdown(f"<span style='color:#888'>{pretty}</span>", unsafe_allow_html=True)
                 continue
@@ -245,71 +260,121 @@ def vista_market():
     )
 
     # ----- GRAFICOS HISTÓRICOS -----
-    with st.expander("Ver evolución histórica de los indicadores clave"):
-        tab_names = []
-        tab_keys = []
-        # Añade el tab combinado de PIB+PIBreal primero
-        if "PIB" in macro_dict and "REALPIB" in macro_dict:
-            tab_names.append("PIB y PIB real")
-            tab_keys.append("PIB_REALPIB")
-        # Recorre macro_blocks para mantener orden y legibilidad
-        macro_keys = [k for block in MACRO_BLOCKS for k, *_ in block["kpis"]]
-        for k in macro_keys:
-            if k in ("PIB", "REALPIB"):
-                continue
-            if k in macro_dict and k in PRETTY_TABS:
-                tab_names.append(PRETTY_TABS[k])
-                tab_keys.append(k)
-        # (Opcional, por si alguna clave extra: asegúrate de no duplicar)
-        if "INTRATE" in macro_dict and "INTRATE" not in tab_keys:
-            tab_names.append(PRETTY_TABS["INTRATE"])
-            tab_keys.append("INTRATE")
-        tabs = st.tabs(tab_names)
-        for i, key in enumerate(tab_keys):
-            if key == "PIB_REALPIB":
-                df_pib = macro_dict["PIB"][["date", "GDP"]]
-                df_real = macro_dict["REALPIB"][["date", "GDPC1"]]
-                df_merged = df_pib.merge(df_real, on="date", how="outer").sort_values("date")
-                y_cols = []
-                if "GDP" in df_merged.columns:
-                    y_cols.append("GDP")
-                if "GDPC1" in df_merged.columns:
-                    y_cols.append("GDPC1")
-                df_merged = df_merged.dropna(subset=y_cols, how='all')
-                df_merged = filtra_periodo(df_merged, periodo)
-                with tabs[i]:
-                    if len(y_cols) > 0 and not df_merged.empty:
-                        legend_map = {
-                            "GDP": "PIB (nominal)",
-                            "GDPC1": "PIB real"
-                        }
-                        fig = px.line(
-                            df_merged, x="date", y=y_cols,
-                            labels={"value": "PIB", "variable": "Indicador"},
-                            title="Evolución PIB nominal y real"
-                        )
-                        for t in fig.data:
-                            if t.name in legend_map:
-                                t.name = legend_map[t.name]
-                        fig.update_layout(height=270, margin=dict(l=5, r=5, t=35, b=18))
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.info("No hay datos suficientes para mostrar el PIB y PIB real.")
-            else:
-                if key not in macro_dict:
-                    continue
-                df = macro_dict[key].dropna()
-                pretty = PRETTY_TABS.get(key, key)
-                col_val = [c for c in df.columns if c != "date"][0]
-                df_filtrado = filtra_periodo(df, periodo)
-                df_filtrado = df_filtrado.dropna(subset=[col_val])
-                with tabs[i]:
-                    if not df_filtrado.empty:
-                        fig = px.line(df_filtrado, x="date", y=col_val, title=f"Evolución de {pretty}")
-                        fig.update_layout(height=270, margin=dict(l=5, r=5, t=35, b=18))
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.info(f"No hay datos suficientes para mostrar {pretty}.")
+    # Solo se construye la figura del indicador seleccionado, y solo con la sección abierta
+    if st.toggle("Ver evolución histórica de los indicadores clave"):
+        tab_names, tab_keys = get_history_tabs(macro_dict)
+        seleccion = st.radio("Indicador", tab_names, horizontal=True, label_visibility="collapsed")
+        key = tab_keys[tab_names.index(seleccion)]
+        fig = get_history_figure(key, macro_dict, periodo)
+        if fig is not None:
+            plotly_chart(fig, use_container_width=True)
+        elif key == "PIB_REALPIB":
+            st.info("No hay datos suficientes para mostrar el PIB y PIB real.")
+        else:
+            st.info(f"No hay datos suficientes para mostrar {PRETTY_TABS.get(key, key)}.")
+
+    # ----- CORRELACIÓN CON LA CARTERA -----
+    if st.toggle("Ver correlación de los indicadores con la cartera"):
+        frecuencia = st.radio(
+            "Frecuencia", list(FRECUENCIAS), index=1, horizontal=True,
+            help="Variaciones de cada indicador frente a los retornos de la cartera en el mismo periodo."
+        )
+        fig = get_correlation_figure(FRECUENCIAS[frecuencia])
+        if fig is not None:
+            plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No hay periodos suficientes en común con la cartera para esa frecuencia.")
+
+def get_history_tabs(macro_dict):
+    tab_names = []
+    tab_keys = []
+    # Añade el tab combinado de PIB+PIBreal primero
+    if "PIB" in macro_dict and "REALPIB" in macro_dict:
+        tab_names.append("PIB y PIB real")
+        tab_keys.append("PIB_REALPIB")
+    # Recorre macro_blocks para mantener orden y legibilidad
+    macro_keys = [k for block in MACRO_BLOCKS for k, *_ in block["kpis"]]
+    for k in macro_keys:
+        if k in ("PIB", "REALPIB"):
+            continue
+        if k in macro_dict and k in PRETTY_TABS:
+            tab_names.append(PRETTY_TABS[k])
+            tab_keys.append(k)
+    # (Opcional, por si alguna clave extra: asegúrate de no duplicar)
+    if "INTRATE" in macro_dict and "INTRATE" not in tab_keys:
+        tab_names.append(PRETTY_TABS["INTRATE"])
+        tab_keys.append("INTRATE")
+    return tab_names, tab_keys
+
+def get_history_figure(key, macro_dict, periodo):
+    # Figura reutilizada mientras no cambien indicador, periodo ni datos
+    return cached_figure(
+        "market_history", (key, periodo), get_data_version(MARKETS_PATH),
+        lambda: build_history_figure(key, macro_dict, periodo)
+    )
+
+def build_history_figure(key, macro_dict, periodo):
+    """Figura de evolución de un indicador (o None si no hay datos)."""
+    if key == "PIB_REALPIB":
+        # Ambas series ya están alineadas en el panel trimestral
+        y_cols = ["PIB", "REALPIB"]
+        df_merged = load_macro_panel(MARKETS_PATH, "Q")[["date"] + y_cols]
+        df_merged = df_merged.dropna(subset=y_cols, how='all')
+        df_merged = filtra_periodo(df_merged, periodo)
+        if df_merged.empty:
+            return None
+        legend_map = {
+            "PIB": "PIB (nominal)",
+            "REALPIB": "PIB real"
+        }
+        fig = px.line(
+            downsample(df_merged, "date", y_cols), x="date", y=y_cols,
+            labels={"value": "PIB", "variable": "Indicador"},
+            title="Evolución PIB nominal y real"
+        )
+        for t in fig.data:
+            if t.name in legend_map:
+                t.name = legend_map[t.name]
+        fig.update_layout(height=270, margin=dict(l=5, r=5, t=35, b=18))
+        return fig
+    if key not in macro_dict:
+        return None
+    df = macro_dict[key].dropna()
+    pretty = PRETTY_TABS.get(key, key)
+    col_val = [c for c in df.columns if c != "date"][0]
+    df_filtrado = filtra_periodo(df, periodo)
+    df_filtrado = df_filtrado.dropna(subset=[col_val])
+    if df_filtrado.empty:
+        return None
+    fig = px.line(downsample(df_filtrado, "date", col_val), x="date", y=col_val, title=f"Evolución de {pretty}")
+    fig.update_layout(height=270, margin=dict(l=5, r=5, t=35, b=18))
+    return fig
+
+FRECUENCIAS = {"Diaria": "D", "Semanal": "W", "Mensual": "M", "Trimestral": "Q"}
+PRETTY_PANEL = {**PRETTY_TABS, "PIB": "PIB (nominal)", "REALPIB": "PIB real"}
+
+def get_correlation_figure(freq):
+    return cached_figure(
+        "market_correlation", freq, get_data_version(MARKETS_PATH, PORTFOLIO_HISTORY_PATH),
+        lambda: build_correlation_figure(freq)
+    )
+
+def build_correlation_figure(freq):
+    """Barras con la correlación de cada indicador con los retornos de la cartera (o None)."""
+    returns = period_returns(load_portfolio_history(PORTFOLIO_HISTORY_PATH), "portfolio_value", freq)
+    corr = correlation_with_returns(load_macro_panel(MARKETS_PATH, freq), returns).dropna()
+    if corr.empty:
+        return None
+    corr = corr.sort_values()
+    nombres = [PRETTY_PANEL.get(k, k) for k in corr.index]
+    fig = px.bar(
+        x=corr.to_numpy(), y=nombres, orientation="h",
+        color=corr.to_numpy(), color_continuous_scale="RdBu", range_color=(-1, 1),
+        labels={"x": "Correlación", "y": "", "color": "Correlación"},
+        title="Correlación con los retornos de la cartera"
+    )
+    fig.update_layout(height=380, margin=dict(l=5, r=5, t=35, b=18), coloraxis_showscale=False)
+    return fig
 
 def show():
     vista_market()
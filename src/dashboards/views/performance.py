@@ -1,11 +1,16 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from src.utils.data_loader import load_portfolio_history, load_benchmarks, load_asset_allocation
+from src.utils.data_loader import load_portfolio_history, load_benchmarks, load_asset_allocation, get_data_version
 from src.utils.metrics import (
-    get_daily_returns, get_sharpe_ratio, get_sortino_ratio, get_max_drawdown,
-    get_annualized_return, get_alpha_beta, get_effective_n, get_turnover
+    get_effective_n, get_turnover,
+    build_value_matrix, compute_kpis_matrix
 )
+from src.utils.rolling import get_rolling_metrics
+from src.utils.alignment import aligned_returns
+from src.utils.downsampling import downsample
+from src.utils.figure_cache import cached_figure
+from src.utils.profiling import stage, plotly_chart
 from config import PORTFOLIO_HISTORY_PATH, BENCHMARKS_PATH, WEIGHTS_PATH, RF
 
 # ----- METAINFORMACIÓN -----
@@ -20,6 +25,16 @@ METRIC_INFO = {
     "Beta (vs SP500)":   {"help": "Sensibilidad al mercado SP500. 1=igual, >1 más volátil.", "icon": "🧭"},
 }
 
+# Ventanas disponibles para las métricas móviles (sesiones)
+ROLLING_WINDOWS = {"1 mes": 21, "3 meses": 63, "6 meses": 126, "1 año": 252}
+ROLLING_INFO = {
+    "Sharpe": "Sharpe anualizado de la ventana móvil.",
+    "Sortino": "Sortino anualizado de la ventana móvil.",
+    "Volatilidad": "Volatilidad anualizada de la ventana móvil.",
+    "Beta": "Beta frente a SP500 en la ventana móvil.",
+    "Drawdown": "Caída desde el máximo alcanzado hasta cada fecha (no depende de la ventana).",
+}
+
 # SOLO METRICAS CLAVE EN RESUMEN
 KPI_MAIN = ["Sharpe Ratio", "ARR (%)", "Max Drawdown (%)", "Effective N"]
 # MÉTRICAS SECUNDARIAS (incluye Sortino ahora)
@@ -67,45 +82,57 @@ def format_metric(metric, value, n_assets=None):
         return f"{value:.2f}"
     return f"{value:.2f}"
 
-def get_metrics(df, df_alloc, n_assets, is_port=True, sp500=None):
-    col = "portfolio_value" if is_port else "value"
-    metrics = {
-        "Sharpe Ratio": get_sharpe_ratio(df, col, rf=RF),
-        "Sortino Ratio": get_sortino_ratio(df, col, rf=RF),
-        "ARR (%)": 100 * get_annualized_return(df, col),
-        "Max Drawdown (%)": 100 * get_max_drawdown(df, col),
-        "Effective N": get_effective_n(df_alloc.iloc[-1].drop('date').values),
-        "Turnover (%)": get_turnover(df_alloc, df["date"].max()) if is_port else None,
+def _metrics_dict(kpis, effective_n, turnover):
+    alpha, beta = kpis["alpha"], kpis["beta"]
+    return {
+        "Sharpe Ratio": kpis["sharpe"],
+        "Sortino Ratio": kpis["sortino"],
+        "ARR (%)": 100 * kpis["annualized_return"],
+        "Max Drawdown (%)": 100 * kpis["max_drawdown"],
+        "Effective N": effective_n,
+        "Turnover (%)": turnover,
+        "Alpha (anual, vs SP500)": None if alpha is None or pd.isna(alpha) else alpha,
+        "Beta (vs SP500)": None if beta is None or pd.isna(beta) else beta,
+    }
+
+def get_all_metrics(values, df_alloc, sp500_name=None):
+    """
+    Métricas de la cartera ("Cartera") y de todos los benchmarks en una sola
+    llamada vectorizada sobre la matriz de valores alineada por fecha
+    (metrics.build_value_matrix).
+    """
+    kpis = compute_kpis_matrix(values, rf=RF, bench=sp500_name)
+    effective_n = get_effective_n(df_alloc.iloc[-1].drop('date').values)
+    turnover = get_turnover(df_alloc, values.index.max())
+    return {
+        nombre: _metrics_dict(row, effective_n, turnover if nombre == "Cartera" else None)
+        for nombre, row in kpis.iterrows()
     }
-    # Alpha y beta solo vs sp500
-    if sp500 is not None:
-        alpha, beta = get_alpha_beta(df, sp500, col_port=col, col_bench="value")
-        metrics["Alpha (anual, vs SP500)"] = alpha
-        metrics["Beta (vs SP500)"] = beta
-    else:
-        metrics["Alpha (anual, vs SP500)"] = None
-        metrics["Beta (vs SP500)"] = None
-    return metrics
-
-def get_sp500_bench(benchmarks):
+
+def get_sp500_name(benchmarks):
     for k in benchmarks:
         if k.lower() == "sp500":
-            return benchmarks[k]
-    return next(iter(benchmarks.values()))
+            return k
+    return next(iter(benchmarks))
 
 def vista_performance():
     st.title("Rendimiento y Métricas")
 
-    df_portfolio = load_portfolio_history(PORTFOLIO_HISTORY_PATH)
-    benchmarks = load_benchmarks(BENCHMARKS_PATH)
-    df_alloc = load_asset_allocation(WEIGHTS_PATH)
-    df_alloc['date'] = pd.to_datetime(df_alloc['date'])
-    n_assets = len(df_alloc.sort_values('date').iloc[-1].drop("date"))
-
-    df_sp500 = get_sp500_bench(benchmarks)
+    with stage("carga de datos"):
+        df_portfolio = load_portfolio_history(PORTFOLIO_HISTORY_PATH)
+        benchmarks = load_benchmarks(BENCHMARKS_PATH)
+        df_alloc = load_asset_allocation(WEIGHTS_PATH)
+        df_alloc['date'] = pd.to_datetime(df_alloc['date'])
+        n_assets = len(df_alloc.sort_values('date').iloc[-1].drop("date"))
+        version = get_data_version(PORTFOLIO_HISTORY_PATH, BENCHMARKS_PATH, WEIGHTS_PATH)
 
-    # --- KPIs cartera principales y secundarios
-    metrics = get_metrics(df_portfolio, df_alloc, n_assets, True, df_sp500)
+    # --- KPIs de cartera y de todos los benchmarks en una sola llamada
+    with stage("métricas"):
+        # Cartera y benchmarks alineados una vez sobre el calendario de la cartera
+        values = build_value_matrix(df_portfolio, benchmarks, name="Cartera")
+        sp500_name = get_sp500_name(benchmarks)
+        all_metrics = get_all_metrics(values, df_alloc, sp500_name)
+    metrics = all_metrics["Cartera"]
 
     # --- RESUMEN EJECUTIVO
     mejor_kpi = sum([metrics["Sharpe Ratio"] > 1, metrics["ARR (%)"] > 8])
@@ -133,31 +160,21 @@ def vista_performance():
         )
 
     # --- TAB COMPARATIVA ---
-    tabs = st.tabs(["Retornos diarios", "Comparar métricas"])
+    tabs = st.tabs(["Retornos diarios", "Comparar métricas", "Métricas móviles"])
     with tabs[0]:
         st.markdown("##### Histórico de retornos diarios")
-        r_port = get_daily_returns(df_portfolio, col="portfolio_value")
-        df_plot = pd.DataFrame({"Fecha": df_portfolio['date'].iloc[-len(r_port):], "Cartera": r_port.values})
-        for name, df_bench in benchmarks.items():
-            r_bmk = get_daily_returns(df_bench, col="value")
-            df_plot[name] = r_bmk.values
-        fig = px.line(df_plot, x="Fecha", y=df_plot.columns[1:], title="Retorno diario: Cartera vs Benchmarks")
-        fig.update_layout(
-            legend=dict(orientation="h", x=0.5, xanchor="center"),
-            yaxis_title="Retorno diario",
-            xaxis_title="Fecha"
+        fig = cached_figure(
+            "performance_retornos", (), version,
+            lambda: build_daily_returns_figure(values)
         )
-        # Cartera destacado
-        fig.update_traces(line=dict(width=3), selector=dict(name="Cartera"))
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
 
     with tabs[1]:
         st.markdown("##### Comparativa con benchmark")
         bench_names = list(benchmarks.keys())
         bench_sel = st.selectbox("Selecciona benchmark", bench_names)
-        df_bench = benchmarks[bench_sel]
-        met_port = get_metrics(df_portfolio, df_alloc, n_assets, True, df_sp500)
-        met_bench = get_metrics(df_bench, df_alloc, n_assets, False, df_sp500)
+        met_port = metrics  # ya calculadas arriba para la cartera
+        met_bench = all_metrics[bench_sel]
 
         # Tabla comparativa
         rows = list(met_port.keys())
@@ -180,14 +197,71 @@ def vista_performance():
 
         # Mini barras solo para KPIs principales
         st.markdown("###### Comparativa visual de KPIs principales")
-        kpi_show = KPI_MAIN
-        df_barras = pd.DataFrame({
-            "Métrica": kpi_show,
-            "Cartera": [met_port[m] if met_port[m] is not None else 0 for m in kpi_show],
-            "Benchmark": [met_bench[m] if met_bench[m] is not None else 0 for m in kpi_show],
-        })
-        fig = px.bar(df_barras, x="Métrica", y=["Cartera", "Benchmark"], barmode="group")
-        st.plotly_chart(fig, use_container_width=True)
+        fig = cached_figure(
+            "performance_barras", (bench_sel,), version,
+            lambda: build_comparison_bars(met_port, met_bench)
+        )
+        plotly_chart(fig, use_container_width=True)
+
+    with tabs[2]:
+        show_rolling_metrics(values, sp500_name, version)
+
+def build_daily_returns_figure(values):
+    # Retornos por fecha sobre el calendario común (sin asignar por posición)
+    df_plot = aligned_returns(values).iloc[1:].reset_index().rename(columns={"date": "Fecha"})
+    df_plot = downsample(df_plot, "Fecha", list(df_plot.columns[1:]))
+    fig = px.line(df_plot, x="Fecha", y=df_plot.columns[1:], title="Retorno diario: Cartera vs Benchmarks")
+    fig.update_layout(
+        legend=dict(orientation="h", x=0.5, xanchor="center"),
+        yaxis_title="Retorno diario",
+        xaxis_title="Fecha"
+    )
+    # Cartera destacado
+    fig.update_traces(line=dict(width=3), selector=dict(name="Cartera"))
+    return fig
+
+def build_comparison_bars(met_port, met_bench):
+    kpi_show = KPI_MAIN
+    df_barras = pd.DataFrame({
+        "Métrica": kpi_show,
+        "Cartera": [met_port[m] if met_port[m] is not None else 0 for m in kpi_show],
+        "Benchmark": [met_bench[m] if met_bench[m] is not None else 0 for m in kpi_show],
+    })
+    return px.bar(df_barras, x="Métrica", y=["Cartera", "Benchmark"], barmode="group")
+
+def show_rolling_metrics(values, sp500_name, version):
+    st.markdown("##### Métricas móviles de la cartera")
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        metrica = st.selectbox("Métrica", list(ROLLING_INFO.keys()), help="\n".join(f"{k}: {v}" for k, v in ROLLING_INFO.items()))
+    with col2:
+        ventanas = st.multiselect("Ventanas", list(ROLLING_WINDOWS.keys()), default=["3 meses", "1 año"])
+    if not ventanas:
+        st.info("Selecciona al menos una ventana.")
+        return
+    fig = cached_figure(
+        "performance_rolling", (metrica, tuple(ventanas)), version,
+        lambda: build_rolling_figure(values, sp500_name, metrica, ventanas)
+    )
+    plotly_chart(fig, use_container_width=True)
+
+def build_rolling_figure(values, sp500_name, metrica, ventanas):
+    df_plot = pd.DataFrame(index=values.index)
+    for v in ventanas:
+        rolling = get_rolling_metrics(values, ROLLING_WINDOWS[v], bench=sp500_name, rf=RF)
+        if metrica == "Drawdown":
+            df_plot["Cartera"] = rolling[metrica]
+            break
+        df_plot[v] = rolling[metrica]
+    df_plot = df_plot.reset_index().rename(columns={"date": "Fecha"})
+    df_plot = downsample(df_plot, "Fecha", list(df_plot.columns[1:]))
+    fig = px.line(df_plot, x="Fecha", y=df_plot.columns[1:], title=f"{metrica} móvil")
+    fig.update_layout(
+        legend=dict(orientation="h", x=0.5, xanchor="center", title=None),
+        yaxis_title=metrica,
+        xaxis_title="Fecha"
+    )
+    return fig
 
 def show():
     vista_performance()
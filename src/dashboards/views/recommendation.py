@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from src.utils.data_loader import load_asset_allocation
-from config import WEIGHTS_PATH, FECHA_CORTE
+from src.utils.data_loader import load_asset_allocation, load_asset_prices, load_portfolio_history, get_data_version
+from src.utils.figure_cache import cached_figure
+from src.utils.profiling import stage, plotly_chart
+from src.utils.rebalance import rebalance, prices_at, COST_BPS, CASH
+from config import WEIGHTS_PATH, PRICES_PATH, PORTFOLIO_HISTORY_PATH, FECHA_CORTE
 
 # ---------- BLOQUE: Cargar y preparar datos ----------
 def load_data():
@@ -74,6 +77,13 @@ def plot_changed_weights(actual_weights, recommended_weights):
         st.info("No hay cambios de pesos recomendados respecto a los actuales.")
         return
 
+    fig = cached_figure(
+        "recommendation_cambios", (), get_data_version(WEIGHTS_PATH),
+        lambda: build_changed_weights_figure(actual_weights, recommended_weights, activos_cambiados)
+    )
+    plotly_chart(fig, use_container_width=True)
+
+def build_changed_weights_figure(actual_weights, recommended_weights, activos_cambiados):
     df = pd.DataFrame({
         "Activo": activos_cambiados,
         "Peso actual": (actual_weights[activos_cambiados].fillna(0) * 100).round(1),
@@ -125,17 +135,88 @@ def plot_changed_weights(actual_weights, recommended_weights):
         bargap=0.20,
         bargroupgap=0.04
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+# ---------- BLOQUE: Simulador de rebalanceo ----------
+def get_candidates(actual_weights, recommended_weights):
+    """Objetivos alternativos (uno por fila) que se evalúan a la vez."""
+    activos = actual_weights.index.drop(CASH, errors="ignore")
+    equiponderada = pd.Series(0.0, index=actual_weights.index)
+    equiponderada[activos] = (1 - actual_weights.get(CASH, 0.0)) / len(activos)
+    if CASH in equiponderada.index:
+        equiponderada[CASH] = actual_weights[CASH]
+    return pd.DataFrame({
+        "Recomendación IA": recommended_weights,
+        "50% hacia la IA": (actual_weights + recommended_weights) / 2,
+        "Equiponderada": equiponderada,
+        "Mantener": actual_weights,
+    }).T
+
+def get_portfolio_value():
+    df = load_portfolio_history(PORTFOLIO_HISTORY_PATH)
+    df = df[df["date"] <= FECHA_CORTE]
+    return float(df["portfolio_value"].iloc[-1]) if len(df) else 0.0
+
+def show_rebalance_simulator(actual_weights, recommended_weights):
+    st.markdown("#### Simulador de rebalanceo")
+    if not st.toggle("Simular operaciones y costes del rebalanceo", key="rebalanceo"):
+        return
+    col1, col2, col3 = st.columns(3)
+    valor = col1.number_input("Valor de la cartera", min_value=0.0, value=get_portfolio_value(), step=100.0, key="rebalanceo_valor")
+    coste_bps = col2.number_input("Coste por operación (pb)", min_value=0.0, value=COST_BPS, step=1.0, key="rebalanceo_coste")
+    enteras = col3.checkbox("Solo acciones enteras", key="rebalanceo_enteras",
+                            help="Redondea cada operación hacia cero a acciones enteras; el resto queda en liquidez.")
+    if valor <= 0:
+        st.info("Indica un valor de cartera positivo para simular el rebalanceo.")
+        return
+    with stage("carga de datos"):
+        precios = prices_at(load_asset_prices(PRICES_PATH, end=FECHA_CORTE), FECHA_CORTE, actual_weights.index)
+    with stage("métricas"):
+        result = rebalance(actual_weights, get_candidates(actual_weights, recommended_weights), precios, valor, coste_bps, enteras)
+
+    # Comparativa de candidatos
+    resumen = result.summary()
+    resumen[["turnover", "tracking"]] *= 100
+    st.dataframe(
+        resumen.rename(columns={
+            "turnover": "Turnover (%)", "cost": "Coste estimado", "n_trades": "Operaciones",
+            "cash_after": "Liquidez final", "tracking": "Desviación vs objetivo (%)",
+        }).rename_axis("Objetivo").reset_index(),
+        hide_index=True, use_container_width=True,
+        column_config={c: st.column_config.NumberColumn(format="%.2f") for c in
+                       ["Turnover (%)", "Coste estimado", "Liquidez final", "Desviación vs objetivo (%)"]}
+    )
+
+    # Operaciones del candidato elegido
+    candidato = st.selectbox("Operaciones para", list(result.candidates), key="rebalanceo_candidato")
+    trades = result.trades(candidato)
+    if trades.empty:
+        st.info("Este objetivo no requiere operaciones.")
+        return
+    trades[["current_weight", "target_weight", "new_weight"]] *= 100
+    st.dataframe(
+        trades.rename(columns={
+            "asset": "Activo", "action": "Acción", "current_weight": "Peso actual (%)",
+            "target_weight": "Peso objetivo (%)", "new_weight": "Peso resultante (%)",
+            "trade_value": "Importe", "shares": "Acciones", "price": "Precio",
+        }),
+        hide_index=True, use_container_width=True,
+        column_config={c: st.column_config.NumberColumn(format="%.2f") for c in
+                       ["Peso actual (%)", "Peso objetivo (%)", "Peso resultante (%)", "Importe", "Acciones", "Precio"]}
+    )
 
 # ---------- BLOQUE PRINCIPAL DE LA VISTA ----------
 def vista_siguiente_movimiento():
     st.title("Siguiente Movimiento")
     st.caption("Comparativa de pesos actuales vs recomendados por IA")
-    df_alloc = load_data()
-    actual_weights, recommended_weights = get_weights(df_alloc)
+    with stage("carga de datos"):
+        df_alloc = load_data()
+    with stage("métricas"):
+        actual_weights, recommended_weights = get_weights(df_alloc)
     show_top_assets(actual_weights, recommended_weights)
     st.markdown("<hr style='border:0.5px solid #EEE; margin-top:18px; margin-bottom:18px;'>", unsafe_allow_html=True)
     plot_changed_weights(actual_weights, recommended_weights)
+    show_rebalance_simulator(actual_weights, recommended_weights)
 
 # ---- Para router principal:
 def show():
@@ -3,6 +3,7 @@ import pandas as pd
 import plotly.express as px
 from src.utils.data_loader import load_asset_allocation, load_asset_prices
 from src.utils.metrics import get_transaction_table, get_cash_series
+from src.utils.profiling import stage, plotly_chart
 from config import WEIGHTS_PATH, PRICES_PATH
 
 def info(texto):
@@ -42,10 +43,12 @@ def vista_transacciones():
     st.title("Transacciones y rotación de cartera")
 
     # 1. Cargar datos
-    df_alloc = load_asset_allocation(WEIGHTS_PATH)
-    df_prices = load_asset_prices(PRICES_PATH)
-    df_trans = get_transaction_table(df_alloc, df_prices)
-    df_cash = get_cash_series(df_alloc)
+    with stage("carga de datos"):
+        df_alloc = load_asset_allocation(WEIGHTS_PATH)
+        df_prices = load_asset_prices(PRICES_PATH)
+    with stage("métricas"):
+        df_trans = get_transaction_table(df_alloc, df_prices)
+        df_cash = get_cash_series(df_alloc)
 
     # 2. KPIs clave y resumen ejecutivo
     n_trans = len(df_trans)
@@ -77,19 +80,20 @@ def vista_transacciones():
     with k4:
         st.markdown("Evolución caja")
         if len(df_cash) > 0:
-            fig = px.line(df_cash, x="date", y="CASH")
-            fig.update_layout(
-                height=90, width=310, margin=dict(l=8, r=8, t=10, b=8),
-                xaxis=dict(
-                    showgrid=False, tickmode="array",
-                    tickvals=[df_cash["date"].iloc[0], df_cash["date"].iloc[-1]],
-                    ticktext=[df_cash["date"].dt.strftime("%b-%y").iloc[0], df_cash["date"].dt.strftime("%b-%y").iloc[-1]],
-                    visible=True, title=None, ticks='outside', ticklen=4
-                ),
-                yaxis=dict(showgrid=False, visible=True)
-            )
-            fig.update_traces(line=dict(width=2, color="#1180f0"))
-            st.plotly_chart(fig, use_container_width=False)
+            with stage("figura"):
+                fig = px.line(df_cash, x="date", y="CASH")
+                fig.update_layout(
+                    height=90, width=310, margin=dict(l=8, r=8, t=10, b=8),
+                    xaxis=dict(
+                        showgrid=False, tickmode="array",
+                        tickvals=[df_cash["date"].iloc[0], df_cash["date"].iloc[-1]],
+                        ticktext=[df_cash["date"].dt.strftime("%b-%y").iloc[0], df_cash["date"].dt.strftime("%b-%y").iloc[-1]],
+                        visible=True, title=None, ticks='outside', ticklen=4
+                    ),
+                    yaxis=dict(showgrid=False, visible=True)
+                )
+                fig.update_traces(line=dict(width=2, color="#1180f0"))
+            plotly_chart(fig, use_container_width=False)
         else:
             st.write("Sin datos de caja")
 
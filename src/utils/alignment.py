@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+# --- Alineación de series por calendario ---
+# Cartera y benchmarks pueden tener calendarios distintos (festivos, huecos).
+# Todas las series se llevan a un calendario maestro con un único join:
+# los valores (precios) se rellenan hacia delante solo entre la primera y la
+# última observación de cada serie (limit_area="inside"), de modo que los
+# huecos no inventan datos fuera de su rango. Métricas y gráficos consumen la
+# matriz resultante en lugar de alinear por posición en cada llamada.
+
+
+def master_calendar(*dates, how="union"):
+    """Calendario ordenado a partir de varias colecciones de fechas ('union' o 'intersection')."""
+    idx = None
+    for d in dates:
+        d = pd.DatetimeIndex(d)
+        if idx is None:
+            idx = d
+        elif how == "union":
+            idx = idx.union(d)
+        elif how == "intersection":
+            idx = idx.intersection(d)
+        else:
+            raise ValueError(f"how debe ser 'union' o 'intersection', no {how!r}")
+    if idx is None:
+        return pd.DatetimeIndex([], name="date")
+    return idx.unique().sort_values().rename("date")
+
+
+def align_series(series, calendar=None, ffill=True):
+    """
+    Matriz fechas x series sobre `calendar` (por defecto, la unión de fechas).
+    `series`: dict nombre -> pd.Series indexada por fecha. El relleno se hace
+    sobre la unión de fechas antes de recortar al calendario, así un valor
+    observado en un día fuera del calendario sigue contando para los días
+    siguientes.
+    """
+    values = pd.concat(series, axis=1, join="outer").sort_index()
+    values.index.name = "date"
+    if ffill:
+        values = values.ffill(limit_area="inside")
+    if calendar is not None:
+        values = values.reindex(pd.DatetimeIndex(calendar, name="date"))
+    return values
+
+
+def align_frames(frames, calendar=None, ffill=True):
+    """Igual que align_series a partir de dict nombre -> (df con columna 'date', columna de valor)."""
+    series = {}
+    for name, (df, col) in frames.items():
+        s = df.set_index("date")[col]
+        if not s.index.is_unique:
+            s = s[~s.index.duplicated(keep="last")]
+        series[name] = s
+    return align_series(series, calendar, ffill)
+
+
+def aligned_returns(values):
+    """Retornos simples de una matriz alineada (NaN antes del inicio de cada serie)."""
+    V = values.to_numpy(dtype=float)
+    R = np.full(V.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        R[1:] = V[1:] / V[:-1] - 1
+    return pd.DataFrame(R, index=values.index, columns=values.columns)
+
+
+def paired_returns(df_a, col_a, df_b, col_b, calendar="a"):
+    """
+    Retornos de dos series alineados por fecha sobre el calendario de la
+    primera (o la unión con calendar=None). Solo se devuelven los días con
+    retorno en ambas.
+    """
+    cal = master_calendar(df_a["date"]) if calendar == "a" else None
+    values = align_frames({"a": (df_a, col_a), "b": (df_b, col_b)}, calendar=cal)
+    R = aligned_returns(values).to_numpy()
+    both = ~np.isnan(R).any(axis=1)
+    return R[both, 0], R[both, 1]
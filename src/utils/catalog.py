@@ -0,0 +1,180 @@
+"""
+Catálogo de activos: una fila por ticker con los conjuntos de datos que
+existen para él (fundamentales, técnicos, columna en asset_prices), su número
+de filas, rango de fechas y hash de contenido.
+
+Las vistas consultan el catálogo (índice por ticker) en lugar de listar las
+carpetas en cada rerun, y los tickers a los que les falta un conjunto de datos
+se detectan antes de intentar leerlo. El catálogo generado se guarda en
+CATALOG_PATH; load_catalog lo usa mientras no sea más antiguo que ninguno de
+los ficheros de origen ni sus carpetas (añadir o quitar ficheros actualiza el
+mtime de la carpeta), y si no, lo construye y lo cachea validando la firma de
+cada fichero. --check compara además el contenido de cada fichero por hash.
+
+Uso:
+    python -m src.utils.catalog [ruta_catalogo.csv] [--check]
+"""
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from src.utils.data_loader import cached, file_hash, read_csv_fast, shared_view, load_asset_prices
+
+DATASETS = ("fundamentals", "technicals", "prices")
+FUNDAMENTALS_SUFFIX = "_fundamentales.csv"
+
+
+def _folder_tickers(folder_path, suffix):
+    """dict ticker -> ruta de los ficheros <ticker><suffix> de la carpeta."""
+    if not os.path.isdir(folder_path):
+        return {}
+    return {
+        f[: -len(suffix)]: os.path.join(folder_path, f)
+        for f in os.listdir(folder_path) if f.endswith(suffix)
+    }
+
+
+def _file_entry(path):
+    # Solo se convierte la columna de fecha; el resto del fichero no se parsea
+    dates = read_csv_fast(path, columns=["date"])["date"]
+    return {
+        "rows": len(dates),
+        "start": dates.min() if len(dates) else pd.NaT,
+        "end": dates.max() if len(dates) else pd.NaT,
+        "hash": file_hash(path),
+    }
+
+
+def _column_entry(dates, values):
+    valid = ~np.isnan(values)
+    d = dates[valid]
+    return {
+        "rows": int(valid.sum()),
+        "start": pd.Timestamp(d[0]) if len(d) else pd.NaT,
+        "end": pd.Timestamp(d[-1]) if len(d) else pd.NaT,
+        "hash": hashlib.blake2b(np.ascontiguousarray(values).tobytes(), digest_size=16).hexdigest(),
+    }
+
+
+def build_catalog(fundamentals_path, technicals_path, prices_path):
+    """DataFrame indexado por ticker con columnas <dataset>, <dataset>_rows/_start/_end/_hash."""
+    entries = {}
+    for ticker, path in _folder_tickers(fundamentals_path, FUNDAMENTALS_SUFFIX).items():
+        entries.setdefault(ticker, {})["fundamentals"] = _file_entry(path)
+    for ticker, path in _folder_tickers(technicals_path, ".csv").items():
+        entries.setdefault(ticker, {})["technicals"] = _file_entry(path)
+    if os.path.exists(prices_path):
+        df_prices = load_asset_prices(prices_path).sort_values("date")
+        dates = df_prices["date"].to_numpy()
+        for ticker in df_prices.columns.drop("date"):
+            values = df_prices[ticker].to_numpy(dtype=float)
+            entries.setdefault(ticker, {})["prices"] = _column_entry(dates, values)
+    rows = []
+    for ticker in sorted(entries):
+        row = {"ticker": ticker}
+        for ds in DATASETS:
+            entry = entries[ticker].get(ds)
+            row[ds] = entry is not None
+            row[f"{ds}_rows"] = entry["rows"] if entry else 0
+            row[f"{ds}_start"] = entry["start"] if entry else pd.NaT
+            row[f"{ds}_end"] = entry["end"] if entry else pd.NaT
+            row[f"{ds}_hash"] = entry["hash"] if entry else ""
+        rows.append(row)
+    columns = ["ticker"] + [f"{ds}{s}" for ds in DATASETS for s in ("", "_rows", "_start", "_end", "_hash")]
+    return pd.DataFrame(rows, columns=columns).set_index("ticker")
+
+
+def write_catalog(catalog, path):
+    tmp = path + ".tmp"
+    catalog.to_csv(tmp, date_format="%Y-%m-%d")
+    os.replace(tmp, path)
+
+
+def read_catalog(path):
+    date_cols = [f"{ds}_{s}" for ds in DATASETS for s in ("start", "end")]
+    df = pd.read_csv(path, index_col="ticker", parse_dates=date_cols, keep_default_na=False, na_values={c: [""] for c in date_cols})
+    for ds in DATASETS:
+        df[ds] = df[ds].astype(bool)
+        df[f"{ds}_hash"] = df[f"{ds}_hash"].astype(str)
+    return df
+
+
+def _source_files(fundamentals_path, technicals_path, prices_path):
+    """Carpetas y ficheros de los que se construye el catálogo (los que existen)."""
+    paths = [p for p in (fundamentals_path, technicals_path, prices_path) if os.path.exists(p)]
+    paths += sorted(_folder_tickers(fundamentals_path, FUNDAMENTALS_SUFFIX).values())
+    paths += sorted(_folder_tickers(technicals_path, ".csv").values())
+    return paths
+
+
+def is_fresh(path, sources):
+    """True si el catálogo existe y no es más antiguo que ninguna de las carpetas/ficheros de origen."""
+    if not os.path.exists(path):
+        return False
+    mtime = os.stat(path).st_mtime_ns
+    return all(os.stat(s).st_mtime_ns <= mtime for s in sources if os.path.exists(s))
+
+
+def load_catalog(path, fundamentals_path, technicals_path, prices_path):
+    """
+    Catálogo de activos. Se lee el generado en `path` si está al día; si no, se
+    construye desde las carpetas (una vez mientras no cambien).
+    """
+    # Se comprueba la firma de cada fichero: uno reescrito en su sitio no cambia el mtime de la carpeta
+    sources = _source_files(fundamentals_path, technicals_path, prices_path)
+    if is_fresh(path, sources):
+        df = cached(("catalog", path), [path], lambda: read_catalog(path), hash_content=False)
+    else:
+        df = cached(("catalog", path, "build"), sources,
+                    lambda: build_catalog(fundamentals_path, technicals_path, prices_path), hash_content=False)
+    return shared_view(df)
+
+
+def available_tickers(catalog, datasets=DATASETS[:2]):
+    """Tickers con todos los conjuntos de datos de `datasets`."""
+    return catalog.index[catalog[list(datasets)].all(axis=1)].tolist()
+
+
+def missing_datasets(catalog, ticker, datasets=DATASETS):
+    """Conjuntos de datos de `datasets` que faltan para el ticker (todos si no está en el catálogo)."""
+    if ticker not in catalog.index:
+        return list(datasets)
+    row = catalog.loc[ticker]
+    return [ds for ds in datasets if not row[ds]]
+
+
+def stale_entries(catalog, fundamentals_path, technicals_path, prices_path):
+    """(ticker, dataset) cuyo contenido actual difiere del registrado en el catálogo."""
+    current = build_catalog(fundamentals_path, technicals_path, prices_path)
+    tickers = catalog.index.union(current.index)
+    stale = []
+    for ds in DATASETS:
+        old = catalog[f"{ds}_hash"].reindex(tickers).fillna("")
+        new = current[f"{ds}_hash"].reindex(tickers).fillna("")
+        stale.extend((t, ds) for t in tickers[(old != new).to_numpy()])
+    return sorted(stale)
+
+
+if __name__ == "__main__":
+    from config import CATALOG_PATH, FUNDAMENTALS_PATH, TECNICALS_PATH, PRICES_PATH
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    path = args[0] if args else CATALOG_PATH
+    sources = (FUNDAMENTALS_PATH, TECNICALS_PATH, PRICES_PATH)
+    if "--check" in sys.argv:
+        stale = stale_entries(read_catalog(path), *sources)
+        for ticker, ds in stale:
+            print(f"  {ticker}: {ds} ha cambiado")
+        if stale:
+            sys.exit(f"{len(stale)} entrada(s) desactualizadas en {path}")
+        print(f"{path} está al día")
+    else:
+        catalog = build_catalog(*sources)
+        write_catalog(catalog, path)
+        print(f"Escrito {path} ({len(catalog)} tickers)")
+        for ds in DATASETS:
+            missing = catalog.index[~catalog[ds]].tolist()
+            if missing:
+                print(f"  Sin {ds}: {', '.join(missing)}")
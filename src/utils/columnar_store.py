@@ -0,0 +1,82 @@
+"""
+Conversión de los técnicos (data/tecnicals/*.csv) a formato columnar (Parquet).
+
+Uso:
+    python -m src.utils.columnar_store [carpeta_tecnicals] [--force]
+
+Por cada TICKER.csv se escribe TICKER.parquet en la misma carpeta. load_technicals
+usa el Parquet cuando existe y no es más antiguo que el CSV, leyendo solo las
+columnas pedidas. Los datos se escriben ordenados por fecha en row groups
+pequeños, así las estadísticas min/max de cada grupo permiten saltarse los
+años que quedan fuera de un filtro start/end.
+"""
+import os
+import sys
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# ~4 años de sesiones por row group
+ROW_GROUP_SIZE = 1024
+
+
+def parquet_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def is_fresh(csv_path):
+    """True si existe un Parquet para csv_path al menos tan reciente como el CSV."""
+    pq_path = parquet_path(csv_path)
+    if not HAS_PYARROW or not os.path.exists(pq_path):
+        return False
+    return os.stat(pq_path).st_mtime_ns >= os.stat(csv_path).st_mtime_ns
+
+
+def convert_csv(csv_path):
+    df = pd.read_csv(csv_path)
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
+        df = df.sort_values("date").reset_index(drop=True)
+    out = parquet_path(csv_path)
+    df.to_parquet(out, engine="pyarrow", index=False, compression="snappy", row_group_size=ROW_GROUP_SIZE)
+    return out
+
+
+def read_parquet_range(path, columns=None, start=None, end=None):
+    """Lee un Parquet filtrando por fecha; pyarrow descarta los row groups fuera de rango."""
+    filters = []
+    if start is not None:
+        filters.append(("date", ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append(("date", "<=", pd.Timestamp(end)))
+    return pd.read_parquet(path, engine="pyarrow", columns=columns, filters=filters or None)
+
+
+def build_technicals_store(folder_path, force=False):
+    """Convierte a Parquet todos los CSV de la carpeta. Devuelve las rutas escritas."""
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow es necesario para generar el almacén columnar")
+    written = []
+    for file in sorted(os.listdir(folder_path)):
+        if not file.endswith(".csv"):
+            continue
+        csv_path = os.path.join(folder_path, file)
+        if force or not is_fresh(csv_path):
+            written.append(convert_csv(csv_path))
+    return written
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if args:
+        folder = args[0]
+    else:
+        from config import TECNICALS_PATH
+        folder = TECNICALS_PATH
+    for path in build_technicals_store(folder, force="--force" in sys.argv):
+        print(f"Escrito {path}")
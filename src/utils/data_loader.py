@@ -1,32 +1,307 @@
 import pandas as pd
 import os
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.columnar_store import HAS_PYARROW, is_fresh, parquet_path, read_parquet_range
+from src.utils import matrix_store
+from src.utils import macro_panel
 
-def load_portfolio_history(path):
+# --- Almacén de datos compartido por todo el proceso ---
+# Cada entrada guarda el DataFrame ya parseado junto con la firma (mtime, tamaño)
+# y el hash de contenido de los ficheros de origen. Todas las sesiones de
+# Streamlit comparten el mismo almacén, de modo que cada CSV se parsea una vez
+# y solo se vuelve a leer cuando el fichero cambia de verdad.
+#
+# Contrato de solo lectura: lo que devuelven los load_* nunca puede alterar el
+# almacén ni lo que ven otras sesiones, venga de un CSV o del almacén binario
+# (memory mapping). Si pandas tiene copy-on-write activado (el dashboard lo
+# activa en su punto de entrada) se devuelve una copia perezosa: no duplica los
+# datos hasta que se modifica, y los arrays de .to_numpy() son de solo lectura.
+# Sin copy-on-write (CLIs, scripts) se devuelve una copia completa.
+#
+# Las entradas cuya clave depende de parámetros libres (rango de fechas,
+# columnas) son "acotadas": solo se conservan las MAX_BOUNDED_ENTRIES usadas más
+# recientemente, para que recorrer rangos no haga crecer el almacén sin límite.
+# Todo acceso a _STORE, _KEY_LOCKS y _BOUNDED_KEYS se hace bajo _STORE_LOCK;
+# el parseo se hace fuera, bajo el lock propio de cada clave.
+MAX_BOUNDED_ENTRIES = 64
+_STORE = {}
+_STORE_LOCK = threading.Lock()
+_KEY_LOCKS = {}
+_BOUNDED_KEYS = OrderedDict()  # claves acotadas, de la menos a la más reciente
+
+def _file_signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _key_lock(key):
+    with _STORE_LOCK:
+        lock = _KEY_LOCKS.get(key)
+        if lock is None:
+            lock = _KEY_LOCKS[key] = threading.Lock()
+        return lock
+
+def _get_entry(key):
+    with _STORE_LOCK:
+        if key in _BOUNDED_KEYS:
+            _BOUNDED_KEYS.move_to_end(key)
+        return _STORE.get(key)
+
+def _put_entry(key, entry, bounded):
+    with _STORE_LOCK:
+        _STORE[key] = entry
+        if bounded:
+            _BOUNDED_KEYS[key] = None
+            _BOUNDED_KEYS.move_to_end(key)
+            while len(_BOUNDED_KEYS) > MAX_BOUNDED_ENTRIES:
+                old, _ = _BOUNDED_KEYS.popitem(last=False)
+                _STORE.pop(old, None)
+                _KEY_LOCKS.pop(old, None)
+
+def cached(key, paths, parse, hash_content=True, bounded=False):
+    """
+    Devuelve el resultado de parse() desde el almacén si los ficheros de `paths`
+    no han cambiado. Si cambia el mtime pero no el contenido (hash), se reutiliza
+    la entrada y solo se actualiza la firma. Con hash_content=False se valida
+    solo por firma (para ficheros grandes que no conviene leer enteros). Con
+    bounded=True la entrada cuenta para el límite LRU MAX_BOUNDED_ENTRIES.
+    """
+    paths = tuple(paths)
+    signature = tuple(_file_signature(p) for p in paths)
+    entry = _get_entry(key)
+    if entry is not None and entry["paths"] == paths and entry["signature"] == signature:
+        return entry["value"]
+    with _key_lock(key):
+        entry = _get_entry(key)
+        if entry is not None and entry["paths"] == paths and entry["signature"] == signature:
+            return entry["value"]
+        hashes = tuple(file_hash(p) for p in paths) if hash_content else signature
+        if entry is not None and entry["paths"] == paths and entry["hashes"] == hashes:
+            entry = dict(entry, signature=signature)
+        else:
+            entry = {"paths": paths, "signature": signature, "hashes": hashes, "value": parse()}
+        _put_entry(key, entry, bounded)
+        return entry["value"]
+
+def csv_files(folder_path):
+    files = [f for f in os.listdir(folder_path) if f.endswith(".csv")]
+    return [os.path.join(folder_path, f) for f in files]
+
+_VERSIONS = {}
+
+def get_data_version(*paths):
+    """
+    Versión de los datos de uno o varios ficheros o carpetas (hash de contenido).
+    Sirve como clave para cachear resultados derivados (figuras, índices...).
+    Mientras la firma de los ficheros no cambie solo cuesta un os.stat por fichero.
+    """
+    files = []
+    for path in paths:
+        files.extend(sorted(csv_files(path)) if os.path.isdir(path) else [path])
+    signature = tuple(_file_signature(p) for p in files)
+    entry = _VERSIONS.get(tuple(files))
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+    version = "-".join(file_hash(p) for p in files)
+    _VERSIONS[tuple(files)] = (signature, version)
+    return version
+
+def clear_cache():
+    """Vacía el almacén de datos (p.ej. tras regenerar los CSV)."""
+    with _STORE_LOCK:
+        _STORE.clear()
+        _BOUNDED_KEYS.clear()
+        _VERSIONS.clear()
+
+
+def shared_view(df):
+    """DataFrame del almacén listo para entregar (ver el contrato de solo lectura al principio del módulo)."""
+    if pd.options.mode.copy_on_write is True:
+        return df.copy(deep=False)
+    return df.copy()
+
+# --- Lectura por rango de fechas en CSV ordenados ---
+# Los CSV con 'date' como primera columna (formato ISO) y ordenados por fecha
+# permiten localizar el rango [start, end] con una búsqueda binaria sobre
+# offsets de bytes, de modo que solo se parsean las filas del rango. Que el
+# fichero esté ordenado se comprueba leyendo solo su columna de fecha, una vez
+# por versión del fichero; si no lo está, se lee entero y se filtra.
+
+def _line_start(f, pos, data_start):
+    # Offset del primer inicio de línea en o después de pos
+    if pos <= data_start:
+        return data_start
+    f.seek(pos - 1)
+    f.readline()
+    return f.tell()
+
+
+def _first_line_after(f, key, data_start, size, strict):
+    # Primer inicio de línea cuya fecha es >= key (o > key si strict)
+    lo, hi = data_start, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        p = _line_start(f, mid, data_start)
+        f.seek(p)
+        date = f.readline().split(b",", 1)[0][:10]
+        if not date or (date > key if strict else date >= key):
+            hi = mid
+        else:
+            lo = mid + 1
+    return _line_start(f, lo, data_start)
+
+
+def _is_sorted_by_date(path):
+    return cached(("sorted_by_date", path), [path],
+                  lambda: read_csv_fast(path, columns=["date"])["date"].is_monotonic_increasing, hash_content=False)
+
+
+def _read_csv_range(path, start=None, end=None, usecols=None):
+    with open(path, "rb") as f:
+        header = f.readline()
+        if not header.startswith(b"date,") or not _is_sorted_by_date(path):
+            df = pd.read_csv(path, usecols=usecols)
+            df["date"] = pd.to_datetime(df["date"])
+            return _filter_dates(df, start, end)
+        data_start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        a = data_start if start is None else _first_line_after(
+            f, pd.Timestamp(start).strftime("%Y-%m-%d").encode(), data_start, size, strict=False)
+        b = size if end is None else _first_line_after(
+            f, pd.Timestamp(end).strftime("%Y-%m-%d").encode(), data_start, size, strict=True)
+        f.seek(a)
+        body = f.read(max(b - a, 0))
+    df = pd.read_csv(io.BytesIO(header + body), usecols=usecols)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def _filter_dates(df, start=None, end=None):
+    if start is not None:
+        df = df[df["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["date"] <= pd.Timestamp(end)]
+    return df.reset_index(drop=True)
+
+
+def _read_portfolio_history(path):
     df = pd.read_csv(path, parse_dates=["date"])
     df = df.sort_values("date")
     return df
 
-def load_asset_allocation(path):
-    df = pd.read_csv(path)
-    return df
+def load_portfolio_history(path):
+    df = cached(("portfolio_history", path), [path], lambda: _read_portfolio_history(path))
+    return shared_view(df)
 
-def load_asset_prices(path):
+def _read_dated_csv(path):
     df = pd.read_csv(path)
     if "date" in df.columns:
         df["date"] = pd.to_datetime(df["date"])
     return df
 
+def load_matrix(path):
+    """
+    Almacén binario con memory mapping (ver matrix_store) de un CSV fecha x activo,
+    o None si no está generado o es más antiguo que el CSV.
+    """
+    if not matrix_store.is_fresh(path):
+        return None
+    files = matrix_store.store_files(path)
+    return cached(("matrix", path), files, lambda: matrix_store.MatrixStore(matrix_store.store_dir(path)), hash_content=False)
+
+def _matrix_frame(path, store, start=None, end=None):
+    # El DataFrame completo sobre el memory mapping se construye una vez y los
+    # rangos son slices suyos: así copy-on-write sabe que comparten datos y una
+    # escritura copia en lugar de fallar sobre el mapping de solo lectura
+    df = cached(("matrix_frame", path), matrix_store.store_files(path), store.to_frame, hash_content=False)
+    if start is None and end is None:
+        return shared_view(df)
+    return shared_view(df.iloc[store.row_slice(start, end)].reset_index(drop=True))
+
+def load_asset_allocation(path):
+    store = load_matrix(path)
+    if store is not None:
+        return _matrix_frame(path, store)
+    df = cached(("asset_allocation", path), [path], lambda: _read_dated_csv(path))
+    return shared_view(df)
+
+def load_asset_prices(path, start=None, end=None):
+    """
+    Precios de cierre por activo. Con start/end solo se leen las filas de ese
+    rango de fechas (si el CSV no está ordenado por fecha, se lee entero y se filtra).
+    """
+    store = load_matrix(path)
+    if store is not None:
+        return _matrix_frame(path, store, start, end)
+    if start is None and end is None:
+        df = cached(("asset_prices", path), [path], lambda: _read_dated_csv(path))
+    else:
+        df = cached(("asset_prices", path, start, end), [path], lambda: _read_csv_range(path, start, end), bounded=True)
+    return shared_view(df)
+
+# --- Lectura concurrente de carpetas de CSV ---
+# Los ficheros de una carpeta se parsean a la vez en un pool acotado; el parser
+# de pyarrow (multihilo y sin GIL) se usa cuando está instalado. Así la carga
+# en frío de una carpeta tarda lo que el fichero más grande, no la suma de todos.
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+def read_csv_fast(path, date_col="date", columns=None):
+    """
+    CSV con la columna de fecha parseada, con el lector de pyarrow si está
+    disponible. Con `columns` solo se convierten esas columnas.
+    """
+    if HAS_PYARROW:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+        try:
+            options = pa_csv.ConvertOptions(column_types={date_col: pa.timestamp("ns")}, include_columns=columns)
+            return pa_csv.read_csv(path, convert_options=options).to_pandas()
+        except pa.ArrowInvalid:
+            pass  # formato que pyarrow no admite (fechas no ISO, marcadores de nulo...): parser de pandas
+    return pd.read_csv(path, parse_dates=[date_col], usecols=columns)
+
+def _read_benchmarks(paths):
+    if not paths:
+        return {}
+    keys = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(paths))) as pool:
+        return dict(zip(keys, pool.map(read_csv_fast, paths)))
+
 def load_benchmarks(folder_path):
     """
     Devuelve un dict nombre -> df, con cada benchmark (csv) ya con su columna date parseada.
+    Los ficheros de la carpeta se leen en paralelo; el orden del dict es el de la carpeta.
     """
-    dfs = {}
-    for file in os.listdir(folder_path):
-        if file.endswith(".csv"):
-            key = os.path.splitext(file)[0]
-            full_path = os.path.join(folder_path, file)
-            dfs[key] = pd.read_csv(full_path, parse_dates=["date"])
-    return dfs
+    paths = csv_files(folder_path)
+    dfs = cached(("benchmarks", folder_path), paths, lambda: _read_benchmarks(paths))
+    return {k: shared_view(v) for k, v in dfs.items()}
+
+def load_macro_panel(folder_path, freq="D"):
+    """
+    Panel macro ancho fecha x indicador a frecuencia `freq` (D/W/M/Q), ver
+    macro_panel. Se lee del panel guardado si está al día con los CSV; si no,
+    se construye a partir de ellos (una vez por versión de los ficheros).
+    """
+    if freq not in macro_panel.FREQS:
+        raise ValueError(f"Frecuencia desconocida: {freq}")
+    paths = csv_files(folder_path)
+    key = ("macro_panel", folder_path, freq)
+    if macro_panel.is_fresh(folder_path, paths):
+        file = macro_panel.panel_path(folder_path, freq)
+        df = cached(key, [file], lambda: pd.read_parquet(file, engine="pyarrow"), hash_content=False)
+    else:
+        df = cached(key, paths, lambda: macro_panel.build_panel(load_benchmarks(folder_path), freq))
+    return shared_view(df)
 
 # --- Función para cargar todo lo necesario para la vista general ---
 def load_dashboard_general_data(portfolio_path, benchmarks_folder, allocation_path):
@@ -37,14 +312,29 @@ def load_dashboard_general_data(portfolio_path, benchmarks_folder, allocation_pa
 
 def load_fundamentals(folder_path, ticker):
     path = os.path.join(folder_path, f"{ticker}_fundamentales.csv")
-    df = pd.read_csv(path)
+    df = cached(("fundamentals", path), [path], lambda: _read_dated_csv(path))
+    return shared_view(df)
+
+def _read_technicals(path, columns, start, end):
+    if is_fresh(path):
+        return read_parquet_range(parquet_path(path), columns, start, end)
+    if start is not None or end is not None:
+        return _read_csv_range(path, start, end, usecols=columns)
+    df = pd.read_csv(path, usecols=columns)
     if "date" in df.columns:
         df["date"] = pd.to_datetime(df["date"])
     return df
 
-def load_technicals(folder_path, ticker):
+def load_technicals(folder_path, ticker, columns=None, start=None, end=None):
+    """
+    Técnicos de un ticker. Si existe el almacén columnar (ver columnar_store) se
+    lee el Parquet; `columns` limita la lectura a esas columnas (más 'date') y
+    start/end descartan en lectura las filas fuera del rango de fechas.
+    """
     path = os.path.join(folder_path, f"{ticker}.csv")
-    df = pd.read_csv(path)
-    if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"])
-    return df
+    if columns is not None:
+        columns = ["date"] + [c for c in columns if c != "date"]
+    paths = [path, parquet_path(path)] if is_fresh(path) else [path]
+    key = ("technicals", path, tuple(columns) if columns is not None else None, start, end)
+    df = cached(key, paths, lambda: _read_technicals(path, columns, start, end), bounded=key[2:] != (None, None, None))
+    return shared_view(df)
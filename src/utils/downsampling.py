@@ -0,0 +1,94 @@
+import numpy as np
+
+# --- Reducción de puntos para gráficos de series largas ---
+# Las trazas se reducen en el servidor antes de construir la figura de Plotly,
+# de modo que el tamaño del payload y el tiempo de render en el navegador no
+# dependen de la longitud del histórico.
+
+MAX_POINTS = 2000
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Índices elegidos por Largest-Triangle-Three-Buckets. Conserva el primer y
+    el último punto; en cada bucket elige el que forma el triángulo de mayor
+    área con el punto anterior elegido y la media del bucket siguiente. Las
+    medias de todos los buckets se calculan de una vez con sumas acumuladas.
+    """
+    x = _as_float(x)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # n_out-2 buckets interiores
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    # Media del bucket siguiente a cada bucket (el último usa el punto final)
+    nxt_lo = np.append(edges[1:-1], n - 1)
+    nxt_hi = np.append(edges[2:], n)
+    cnt = nxt_hi - nxt_lo
+    avg_x = (cx[nxt_hi] - cx[nxt_lo]) / cnt
+    avg_y = (cy[nxt_hi] - cy[nxt_lo]) / cnt
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x[b]) * (ys - y[a]) - (x[a] - xs) * (avg_y[b] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    return out
+
+
+def minmax_indices(y, n_out):
+    """Índices de mínimo y máximo de cada bucket (totalmente vectorizado)."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    n_buckets = max(n_out // 2, 1)
+    if n_out >= n:
+        return np.arange(n)
+    size = int(np.ceil(n / n_buckets))
+    pad = n_buckets * size - n
+    yp = np.concatenate((y, np.full(pad, np.nan))).reshape(n_buckets, size)
+    base = np.arange(n_buckets) * size
+    filled_lo = np.where(np.isnan(yp), np.inf, yp)
+    filled_hi = np.where(np.isnan(yp), -np.inf, yp)
+    idx = np.concatenate((base + filled_lo.argmin(axis=1), base + filled_hi.argmax(axis=1), [0, n - 1]))
+    return np.unique(np.clip(idx, 0, n - 1))
+
+
+def downsample(df, x, y, n_out=MAX_POINTS, method="lttb"):
+    """
+    Reduce un DataFrame a como mucho n_out filas para pintarlo. `y` puede ser
+    una columna o una lista; con varias columnas (que comparten eje x) cada
+    una recibe n_out / nº columnas puntos y se conserva la unión de los
+    índices elegidos. Las filas con NaN en una serie no cuentan para esa serie.
+    """
+    if len(df) <= n_out:
+        return df
+    cols = [y] if isinstance(y, str) else list(y)
+    n_out = max(n_out // max(len(cols), 1), 3)
+    xs = df[x].to_numpy()
+    keep = []
+    for col in cols:
+        vals = df[col].to_numpy(dtype=float)
+        valid = np.flatnonzero(~np.isnan(vals))
+        if len(valid) == 0:
+            continue
+        if method == "minmax":
+            idx = minmax_indices(vals[valid], n_out)
+        else:
+            idx = lttb_indices(xs[valid], vals[valid], n_out)
+        keep.append(valid[idx])
+    if not keep:
+        return df
+    return df.iloc[np.unique(np.concatenate(keep))]
@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.profiling import stage
+
+# --- Caché de figuras Plotly compartida por todo el proceso ---
+# Clave: (vista, parámetros del widget, versión de los datos). Si ninguno cambia,
+# la figura es idéntica y no hace falta volver a construirla. La caché es LRU y
+# está acotada por el tamaño estimado de las figuras que guarda: los bytes de
+# los arrays de datos de sus trazas, sin serializarlas.
+#
+# Se guarda el objeto Figure ya construido (no el JSON): st.plotly_chart vuelve a
+# codificar lo que recibe en cualquier caso (también un dict, que convierte antes
+# en Figure), así que la caché ahorra la construcción, no la serialización. Las
+# figuras cacheadas son compartidas entre sesiones: no deben modificarse después
+# de obtenerlas.
+
+MAX_BYTES = 64 * 1024 * 1024
+# Propiedades de las trazas que concentran el volumen de datos de una figura
+DATA_PROPS = ("x", "y", "z", "text", "hovertext", "customdata", "labels", "values", "ids")
+# Bytes estimados por elemento en listas y arrays de objetos (fechas, textos...)
+ITEM_BYTES = 16
+TRACE_OVERHEAD = 1024
+
+
+def _data_bytes(value):
+    if value is None or isinstance(value, (str, int, float)):
+        return 0
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return value.nbytes
+    try:
+        return len(value) * ITEM_BYTES
+    except TypeError:
+        return 0
+
+
+def figure_size(fig):
+    """Tamaño aproximado de la figura a partir de los arrays de datos de sus trazas."""
+    size = 0
+    for trace in fig.data:
+        size += TRACE_OVERHEAD
+        for prop in DATA_PROPS:
+            size += _data_bytes(getattr(trace, prop, None))
+    return size
+
+
+class FigureCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, fig):
+        size = figure_size(fig)
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self._items.pop(key)[1]
+            self._items[key] = (fig, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self._bytes -= old_size
+        return fig
+
+    def get_or_build(self, key, builder):
+        """Devuelve la figura de `key` o la construye con builder() y la guarda."""
+        fig = self.get(key)
+        if fig is not None:
+            return fig
+        with self._lock:
+            self.misses += 1
+        with stage("figura"):
+            fig = builder()
+        if fig is None:
+            return None
+        return self.put(key, fig)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"items": len(self._items), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+FIGURES = FigureCache()
+
+
+def cached_figure(view, params, version, builder):
+    """
+    Figura de `view` para esos parámetros y versión de datos, construida con
+    builder() solo si no está en caché. `params` y `version` deben ser hashables.
+    """
+    return FIGURES.get_or_build((view, params, version), builder)
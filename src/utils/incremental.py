@@ -0,0 +1,321 @@
+"""
+Estado incremental de KPIs para una cartera que crece día a día.
+
+Cada nuevo par (fecha, valor) actualiza en O(1) los momentos de los retornos
+(Welford), los momentos de la cola negativa, el máximo para el drawdown y los
+co-momentos con cada benchmark. Los KPIs resultantes coinciden con
+metrics.compute_kpis a tolerancia de coma flotante:
+- alpha y beta emparejan los retornos igual que alignment.paired_returns: el
+  valor del benchmark en cada fecha de la cartera es su última observación
+  hasta esa fecha, solo entre su primera y su última observación. Los días de
+  la cartera posteriores a la última observación del benchmark quedan
+  pendientes hasta que llegan datos nuevos del benchmark.
+- el VaR es el percentil exacto (interpolación lineal, como np.percentile).
+  Necesita todos los retornos, que se guardan agrupados en bins de
+  VAR_BIN_WIDTH: añadir un día es O(1) y el percentil solo ordena el bin que
+  lo contiene. El estado guardado crece un número por día de histórico.
+
+Es una herramienta de línea de comandos: el dashboard calcula sus KPIs en lote
+(metrics.compute_kpis_matrix) y no usa este estado.
+
+Uso:
+    python -m src.utils.incremental [ruta_estado.json]
+"""
+import json
+import math
+import os
+import sys
+
+import pandas as pd
+
+from src.utils.metrics import KPIResult
+
+# Anchura de los bins en que se agrupan los retornos para el VaR (1 punto básico)
+VAR_BIN_WIDTH = 1e-4
+
+
+def _iso(date):
+    return date.isoformat() if date is not None else None
+
+
+def _timestamp(value):
+    return pd.Timestamp(value) if value else None
+
+
+class _CoMoments:
+    """
+    Co-momentos (Welford bivariante) entre los retornos de la cartera y un
+    benchmark. El valor del benchmark en cada fecha de la cartera es su última
+    observación hasta esa fecha (ver alignment.paired_returns).
+    """
+
+    def __init__(self, n=0, mean_x=0.0, mean_y=0.0, c_xy=0.0, m2_y=0.0,
+                 prev=None, obs_date=None, obs_value=None, pending=None):
+        self.n, self.mean_x, self.mean_y = n, mean_x, mean_y
+        self.c_xy, self.m2_y = c_xy, m2_y
+        self.prev = prev                # valor del benchmark en la última fecha resuelta de la cartera
+        self.obs_date = obs_date        # última observación del benchmark
+        self.obs_value = obs_value
+        self.pending = pending or []    # (fecha, retorno de la cartera) posteriores a obs_date
+
+    def _add_pair(self, x, y):
+        self.n += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.n
+        dy = y - self.mean_y
+        self.mean_y += dy / self.n
+        self.c_xy += dx * (y - self.mean_y)
+        self.m2_y += dy * (y - self.mean_y)
+
+    def _resolve(self, r, value):
+        # value: valor del benchmark en esa fecha de la cartera (None antes de su primera observación)
+        if r is not None and self.prev is not None and value is not None:
+            self._add_pair(r, value / self.prev - 1)
+        self.prev = value
+
+    def _resolve_pending(self, until, value, inclusive=False):
+        # Los pendientes están en orden de fecha: se emparejan los anteriores a `until`
+        i = 0
+        while i < len(self.pending) and (self.pending[i][0] < until or (inclusive and self.pending[i][0] == until)):
+            self._resolve(self.pending[i][1], value)
+            i += 1
+        del self.pending[:i]
+
+    def observe(self, date, value):
+        """Nueva observación del benchmark (las fechas ya vistas se ignoran)."""
+        if self.obs_date is not None and date <= self.obs_date:
+            return
+        self._resolve_pending(date, self.obs_value)
+        self.obs_date, self.obs_value = date, value
+        self._resolve_pending(date, value, inclusive=True)
+
+    def flush(self):
+        """Empareja los días pendientes con la última observación (el benchmark continúa después de ellos)."""
+        for _, r in self.pending:
+            self._resolve(r, self.obs_value)
+        self.pending = []
+
+    def portfolio_day(self, date, r):
+        """Día de la cartera con retorno r (None el primer día)."""
+        if not self.pending and self.obs_date == date:
+            self._resolve(r, self.obs_value)
+        else:
+            self.pending.append((date, r))
+
+    def alpha_beta(self, periods_per_year=252):
+        if self.n < 2 or self.m2_y == 0:
+            return None, None
+        beta = self.c_xy / self.m2_y
+        alpha = self.mean_x - beta * self.mean_y
+        return alpha * periods_per_year, beta
+
+    def to_dict(self):
+        d = dict(vars(self))
+        d["obs_date"] = _iso(self.obs_date)
+        d["pending"] = [[_iso(t), r] for t, r in self.pending]
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        d = dict(d)
+        d["obs_date"] = _timestamp(d["obs_date"])
+        d["pending"] = [(pd.Timestamp(t), r) for t, r in d["pending"]]
+        return cls(**d)
+
+
+class IncrementalKPIs:
+    def __init__(self, rf=0.0, periods_per_year=252, alpha=0.05):
+        self.rf = rf
+        self.periods_per_year = periods_per_year
+        self.alpha = alpha
+        self.first_date = self.last_date = None
+        self.first_value = self.last_value = None
+        self.n = 0            # número de retornos
+        self.mean = 0.0       # media de retornos (Welford)
+        self.m2 = 0.0         # suma de cuadrados de desviaciones (Welford)
+        self.down_sq = 0.0    # suma de excesos negativos al cuadrado
+        self.down_n = 0       # número de excesos negativos
+        self.peak = None
+        self.max_drawdown = 0.0
+        self.return_bins = {}  # índice de bin -> retornos del bin (sin ordenar)
+        self.benchmarks = {}
+
+    # ---------- Actualización ----------
+    def update(self, date, value, bench_values=None):
+        """Añade un nuevo día. bench_values: dict nombre -> valor del benchmark ese día."""
+        date = pd.Timestamp(date)
+        for name, v in (bench_values or {}).items():
+            if not pd.isna(v):
+                self.benchmarks.setdefault(name, _CoMoments()).observe(date, float(v))
+        return self._add_day(date, value)
+
+    def _add_day(self, date, value):
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"Fecha {date.date()} no posterior a la última ({self.last_date.date()})")
+        value = float(value)
+        r = None
+        if self.last_value is None:
+            self.first_date, self.first_value = date, value
+            self.peak = value
+        else:
+            r = value / self.last_value - 1
+            self.n += 1
+            delta = r - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (r - self.mean)
+            excess = r - self.rf / self.periods_per_year
+            if excess < 0:
+                self.down_sq += excess ** 2
+                self.down_n += 1
+            self.return_bins.setdefault(math.floor(r / VAR_BIN_WIDTH), []).append(r)
+        for co in self.benchmarks.values():
+            co.portfolio_day(date, r)
+        self.peak = max(self.peak, value)
+        self.max_drawdown = min(self.max_drawdown, value / self.peak - 1)
+        self.last_date, self.last_value = date, value
+        return self
+
+    @staticmethod
+    def _rows_after(df, date):
+        """Filas de df posteriores a `date` (búsqueda binaria si df está ordenado)."""
+        if not df["date"].is_monotonic_increasing:
+            df = df.sort_values("date", kind="stable")
+        if date is None:
+            return df
+        return df.iloc[df["date"].searchsorted(date, side="right"):]
+
+    def sync(self, df, col="portfolio_value", benchmarks=None, col_bench="value"):
+        """
+        Añade las filas de df posteriores a la última fecha y las observaciones
+        nuevas de cada benchmark hasta la última fecha de la cartera, en orden
+        de fecha (a igual fecha, primero el benchmark).
+        """
+        df = self._rows_after(df, self.last_date)
+        end = df["date"].iloc[-1] if not df.empty else self.last_date
+        if end is None:
+            return self
+        events, continues = [], []
+        for name, b in (benchmarks or {}).items():
+            co = self.benchmarks.get(name)
+            b = self._rows_after(b[["date", col_bench]].dropna(), co.obs_date if co else None)
+            b = b[~b["date"].duplicated(keep="last")]
+            if not b.empty and b["date"].iloc[-1] > end:
+                continues.append(name)
+            b = b[b["date"] <= end]
+            events.extend((d, 0, name, v) for d, v in zip(b["date"], b[col_bench].to_numpy(dtype=float)))
+        events.extend((d, 1, None, v) for d, v in zip(df["date"], df[col].to_numpy(dtype=float)))
+        events.sort(key=lambda e: (e[0], e[1]))
+        for date, kind, name, value in events:
+            if kind == 0:
+                self.benchmarks.setdefault(name, _CoMoments()).observe(date, value)
+            else:
+                self._add_day(date, value)
+        # Benchmarks con datos después de la última fecha: sus días pendientes ya se pueden emparejar
+        for name in continues:
+            if name in self.benchmarks:
+                self.benchmarks[name].flush()
+        return self
+
+    # ---------- KPIs ----------
+    def _order_stat(self, k):
+        """k-ésimo retorno (desde 0) en orden ascendente; solo se ordena su bin."""
+        seen = 0
+        for b in sorted(self.return_bins):
+            values = self.return_bins[b]
+            if seen + len(values) > k:
+                return sorted(values)[k - seen]
+            seen += len(values)
+        raise IndexError(k)
+
+    def var(self):
+        # Percentil alpha con interpolación lineal entre estadísticos de orden (np.percentile)
+        if self.n == 0:
+            return math.nan
+        pos = self.alpha * (self.n - 1)
+        lo = math.floor(pos)
+        low = self._order_stat(lo)
+        if pos == lo:
+            return low
+        return low + (pos - lo) * (self._order_stat(lo + 1) - low)
+
+    def kpis(self, bench=None):
+        """KPIResult con el estado actual; alpha/beta frente a `bench` si se indica."""
+        ppy = self.periods_per_year
+        if self.n < 2:
+            raise ValueError("Se necesitan al menos 3 valores para calcular los KPIs")
+        std = math.sqrt(self.m2 / (self.n - 1))
+        mean_excess = self.mean - self.rf / ppy
+        denom = math.sqrt(self.down_sq / self.down_n) if self.down_n else 0.0
+        alpha, beta = (None, None)
+        if bench is not None and bench in self.benchmarks:
+            alpha, beta = self.benchmarks[bench].alpha_beta(ppy)
+        return KPIResult(
+            total_return=self.last_value / self.first_value - 1,
+            annualized_return=(self.last_value / self.first_value) ** (ppy / self.n) - 1,
+            volatility=std * math.sqrt(ppy),
+            sharpe=math.sqrt(ppy) * mean_excess / std,
+            sortino=math.sqrt(ppy) * mean_excess / denom if denom != 0 else math.nan,
+            max_drawdown=self.max_drawdown,
+            var=self.var(),
+            alpha=alpha,
+            beta=beta,
+        )
+
+    # ---------- Persistencia ----------
+    def to_dict(self):
+        d = {k: v for k, v in vars(self).items() if k != "benchmarks"}
+        d["first_date"] = _iso(self.first_date)
+        d["last_date"] = _iso(self.last_date)
+        d["return_bins"] = {str(b): values for b, values in self.return_bins.items()}
+        d["benchmarks"] = {name: co.to_dict() for name, co in self.benchmarks.items()}
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls(d["rf"], d["periods_per_year"], d["alpha"])
+        for k, v in d.items():
+            if k not in ("benchmarks", "return_bins"):
+                setattr(state, k, v)
+        state.return_bins = {int(b): values for b, values in d["return_bins"].items()}
+        state.first_date = _timestamp(d["first_date"])
+        state.last_date = _timestamp(d["last_date"])
+        state.benchmarks = {name: _CoMoments.from_dict(co) for name, co in d["benchmarks"].items()}
+        return state
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def update_kpi_state(state_path, df_portfolio, benchmarks=None, rf=0.0, periods_per_year=252):
+    """
+    Carga el estado persistido (o lo crea), añade los días nuevos del histórico
+    y lo vuelve a guardar. Si rf o la frecuencia cambian, el estado se reconstruye.
+    """
+    state = None
+    if os.path.exists(state_path):
+        state = IncrementalKPIs.load(state_path)
+        if state.rf != rf or state.periods_per_year != periods_per_year:
+            state = None
+    if state is None:
+        state = IncrementalKPIs(rf, periods_per_year)
+    state.sync(df_portfolio, benchmarks=benchmarks)
+    state.save(state_path)
+    return state
+
+
+if __name__ == "__main__":
+    from config import PORTFOLIO_HISTORY_PATH, BENCHMARKS_PATH, KPI_STATE_PATH, RF
+    from src.utils.data_loader import load_portfolio_history, load_benchmarks
+    path = sys.argv[1] if len(sys.argv) > 1 else KPI_STATE_PATH
+    state = update_kpi_state(path, load_portfolio_history(PORTFOLIO_HISTORY_PATH), load_benchmarks(BENCHMARKS_PATH), rf=RF)
+    print(f"Estado actualizado hasta {state.last_date.date()} ({state.n} retornos)")
+    for k, v in state.kpis(bench="sp500" if "sp500" in state.benchmarks else None).to_dict().items():
+        print(f"  {k}: {v}")
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+# --- Índice "as of" de indicadores macro ---
+# Por cada serie (indicador, columna) guarda una vez las fechas ordenadas
+# (datetime64[ns]) y sus valores sin NaN. Último valor, anterior y variación
+# interanual a cualquier fecha se resuelven con np.searchsorted, sin ordenar
+# ni filtrar el DataFrame en cada consulta.
+
+YOY_DAYS = 365
+
+
+class MacroIndex:
+    def __init__(self, macro_dict):
+        self._series = {}
+        self._default_col = {}
+        for key, df in macro_dict.items():
+            cols = [c for c in df.columns if c != "date"]
+            if not cols:
+                continue
+            self._default_col[key] = cols[0]
+            for col in cols:
+                vals = df[["date", col]].dropna()
+                vals = vals.sort_values("date", kind="stable")
+                self._series[(key, col)] = (
+                    vals["date"].to_numpy(dtype="datetime64[ns]"),
+                    vals[col].to_numpy(),
+                )
+
+    def __contains__(self, key):
+        return key in self._default_col
+
+    def _arrays(self, key, col=None):
+        return self._series.get((key, col or self._default_col.get(key)))
+
+    def date_range(self):
+        """(primera, última) fecha con datos entre todas las series."""
+        firsts = [d[0] for d, _ in self._series.values() if len(d)]
+        lasts = [d[-1] for d, _ in self._series.values() if len(d)]
+        if not firsts:
+            return None, None
+        return pd.Timestamp(min(firsts)), pd.Timestamp(max(lasts))
+
+    def _position(self, dates, as_of):
+        """Índice de la última observación <= as_of (o la última si as_of es None)."""
+        if as_of is None:
+            return len(dates) - 1
+        return int(np.searchsorted(dates, np.datetime64(pd.Timestamp(as_of), "ns"), side="right")) - 1
+
+    def last_and_yoy(self, key, col=None, as_of=None):
+        """
+        (último valor, valor anterior, variación % frente al último dato de hace
+        al menos un año) a fecha `as_of`. (None, None, None) si no hay 2 datos.
+        """
+        arrays = self._arrays(key, col)
+        if arrays is None:
+            return None, None, None
+        dates, values = arrays
+        i = self._position(dates, as_of)
+        if i < 1:
+            return None, None, None
+        last, prev = values[i], values[i - 1]
+        j = int(np.searchsorted(dates, dates[i] - np.timedelta64(YOY_DAYS, "D"), side="right")) - 1
+        yoy = None
+        if j >= 0:
+            yoy_val = values[j]
+            yoy = (last - yoy_val) / abs(yoy_val) * 100 if yoy_val != 0 else None
+        return last, prev, yoy
@@ -0,0 +1,194 @@
+"""
+Panel macro unificado: todas las series de data/markets en una tabla ancha
+fecha x indicador sobre un calendario común, a frecuencia diaria (días
+hábiles), semanal, mensual o trimestral.
+
+Cada serie tiene una regla explícita (RULES): cómo se agrega al bajar de
+frecuencia (último valor o media) y durante cuántos días se rellena hacia
+delante su último dato, de modo que una serie trimestral mantiene su valor
+hasta el siguiente trimestre pero una diaria no arrastra datos de hace meses.
+Nunca se rellena antes de la primera observación ni después de la última.
+
+Los paneles se guardan en <carpeta>.panel/<freq>.parquet; load_macro_panel
+los usa mientras no sean más antiguos que los CSV.
+
+Uso:
+    python -m src.utils.macro_panel [carpeta_markets] [--force]
+"""
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+from src.utils.columnar_store import HAS_PYARROW
+
+# Frecuencia del panel -> regla de pandas (etiquetas: día hábil, viernes,
+# inicio de mes, inicio de trimestre)
+FREQS = {"D": "B", "W": "W-FRI", "M": "MS", "Q": "QS"}
+
+# agg: agregación dentro de cada periodo; max_stale: días máximos que se
+# rellena hacia delante un dato; change: variación para correlaciones
+# ("pct" relativa, "diff" absoluta para tasas y diferenciales)
+RULES = {
+    "PIB": {"agg": "last", "max_stale": 190, "change": "pct"},
+    "REALPIB": {"agg": "last", "max_stale": 190, "change": "pct"},
+    "CPI": {"agg": "last", "max_stale": 70, "change": "pct"},
+    "TASADES": {"agg": "last", "max_stale": 70, "change": "diff"},
+    "CONFIDENCE": {"agg": "last", "max_stale": 70, "change": "pct"},
+    "M2": {"agg": "last", "max_stale": 21, "change": "pct"},
+    "INTRATE": {"agg": "mean", "max_stale": 7, "change": "diff"},
+    "yield_curve": {"agg": "last", "max_stale": 7, "change": "diff"},
+    "DJ": {"agg": "last", "max_stale": 7, "change": "pct"},
+    "NASDAQ100": {"agg": "last", "max_stale": 7, "change": "pct"},
+    "VIXCLS": {"agg": "last", "max_stale": 7, "change": "pct"},
+    "DXY": {"agg": "last", "max_stale": 7, "change": "pct"},
+    "OIL": {"agg": "last", "max_stale": 7, "change": "pct"},
+}
+DEFAULT_RULE = {"agg": "last", "max_stale": 7, "change": "pct"}
+
+
+def get_rule(key):
+    return RULES.get(key, DEFAULT_RULE)
+
+
+def _check_freq(freq):
+    if freq not in FREQS:
+        raise ValueError(f"Frecuencia desconocida: {freq} (usa {', '.join(FREQS)})")
+
+
+# pandas genera las fechas de los offsets "B" y "W-FRI" una a una (lento con
+# décadas de datos diarios); para D y W las etiquetas se calculan con aritmética
+# sobre el día de la semana y el calendario filtrando un rango diario.
+def _period_labels(index, freq):
+    """Etiqueta D/W de cada fecha: el día hábil (fin de semana -> viernes anterior) o el viernes de su semana."""
+    days = index.normalize()
+    dow = days.dayofweek.to_numpy()
+    if freq == "D":
+        return days - pd.to_timedelta(np.maximum(dow - 4, 0), unit="D")
+    return days + pd.to_timedelta((4 - dow) % 7, unit="D")
+
+
+def _calendar(start, end, freq):
+    if freq in ("D", "W"):
+        days = pd.date_range(start, end, freq="D", name="date")
+        return days[days.dayofweek < 5] if freq == "D" else days[days.dayofweek == 4]
+    return pd.date_range(start, end, freq=FREQS[freq], name="date")
+
+
+def _aggregate(s, freq, how):
+    """Serie agregada a `freq` con `how`, solo con los periodos que tienen datos."""
+    if freq in ("D", "W"):
+        return s.groupby(_period_labels(s.index, freq)).agg(how)
+    return s.resample(FREQS[freq]).agg(how).dropna()
+
+
+def _resampled(df, key, freq):
+    col = [c for c in df.columns if c != "date"][0]
+    s = df.set_index("date")[col].dropna().sort_index()
+    return _aggregate(s, freq, get_rule(key)["agg"])
+
+
+def _fill(s, calendar, max_stale):
+    """Reindexa al calendario rellenando hacia delante hasta max_stale días, sin extrapolar."""
+    filled = s.reindex(calendar, method="ffill")
+    obs_date = pd.Series(s.index, index=s.index).reindex(calendar, method="ffill")
+    stale = (calendar - pd.DatetimeIndex(obs_date)) > pd.Timedelta(days=max_stale)
+    filled[stale | (calendar > s.index[-1])] = np.nan
+    return filled
+
+
+def build_panel(macro_dict, freq="D"):
+    """Panel ancho (columna 'date' + un indicador por columna) a frecuencia `freq`."""
+    _check_freq(freq)
+    series = {key: _resampled(df, key, freq) for key, df in macro_dict.items() if len(df.columns) > 1}
+    series = {key: s for key, s in series.items() if not s.empty}
+    if not series:
+        return pd.DataFrame({"date": pd.DatetimeIndex([])})
+    start = min(s.index[0] for s in series.values())
+    end = max(s.index[-1] for s in series.values())
+    calendar = _calendar(start, end, freq)
+    panel = pd.DataFrame(
+        {key: _fill(s, calendar, get_rule(key)["max_stale"]).to_numpy() for key, s in series.items()},
+        index=calendar,
+    )
+    return panel.reset_index()
+
+
+# --- Variaciones y correlación con retornos ---
+def panel_changes(panel):
+    """Variación periodo a periodo de cada indicador según su regla (relativa o absoluta)."""
+    values = panel.set_index("date")
+    changes = {}
+    for key in values.columns:
+        s = values[key]
+        changes[key] = s.diff() if get_rule(key)["change"] == "diff" else s.pct_change(fill_method=None)
+    return pd.DataFrame(changes, index=values.index)
+
+
+def period_returns(df, col, freq):
+    """Retornos de una serie de valor (p.ej. la cartera) en los periodos del panel `freq`."""
+    _check_freq(freq)
+    s = df.set_index("date")[col].dropna().sort_index()
+    return _aggregate(s, freq, "last").pct_change().dropna()
+
+
+def correlation_with_returns(panel, returns, min_obs=8):
+    """
+    Correlación de las variaciones de cada indicador con `returns` (Serie
+    indexada por las mismas fechas del panel). NaN si hay menos de min_obs
+    periodos en común.
+    """
+    changes = panel_changes(panel).reindex(returns.index)
+    corr = changes.corrwith(returns)
+    counts = changes.notna().sum()
+    return corr.where(counts >= min_obs)
+
+
+# --- Almacén persistido ---
+def store_dir(folder_path):
+    return os.path.normpath(folder_path) + ".panel"
+
+
+def panel_path(folder_path, freq):
+    return os.path.join(store_dir(folder_path), f"{freq}.parquet")
+
+
+def is_fresh(folder_path, csv_paths):
+    """True si existen los paneles de todas las frecuencias y no son más antiguos que los CSV."""
+    files = [panel_path(folder_path, f) for f in FREQS]
+    if not HAS_PYARROW or not all(os.path.exists(f) for f in files):
+        return False
+    csv_mtime = max((os.stat(p).st_mtime_ns for p in csv_paths), default=0)
+    return all(os.stat(f).st_mtime_ns >= csv_mtime for f in files)
+
+
+def build_panel_store(folder_path, force=False):
+    """Construye y guarda los paneles de todas las frecuencias. Devuelve la carpeta (None si ya estaba al día)."""
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow es necesario para guardar el panel macro")
+    from src.utils.data_loader import csv_files, load_benchmarks
+    if not force and is_fresh(folder_path, csv_files(folder_path)):
+        return None
+    macro_dict = load_benchmarks(folder_path)
+    out = store_dir(folder_path)
+    tmp = out + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for freq in FREQS:
+        build_panel(macro_dict, freq).to_parquet(os.path.join(tmp, f"{freq}.parquet"), engine="pyarrow", index=False)
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+    return out
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if args:
+        folder = args[0]
+    else:
+        from config import MARKETS_PATH
+        folder = MARKETS_PATH
+    out = build_panel_store(folder, force="--force" in sys.argv)
+    print(f"Escrito {out}" if out else "El panel macro ya está al día")
@@ -0,0 +1,100 @@
+"""
+Almacén binario para matrices densas fecha x activo (asset_prices, asset_allocation).
+
+Por cada CSV se genera una carpeta <nombre>.mat/ con:
+    values.npy   matriz float64/float32 (filas = fechas, columnas = activos)
+    dates.npy    fechas (datetime64[ns]) ordenadas
+    tickers.npy  nombres de columna
+Los .npy se abren con memory mapping: abrir el almacén no lee los datos, las
+filas y columnas se obtienen como vistas sin copia, y varios procesos del
+servidor comparten las mismas páginas a través de la caché del sistema.
+
+Uso:
+    python -m src.utils.matrix_store data/asset_prices.csv data/asset_allocation.csv [--float32]
+"""
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+FILES = ("values.npy", "dates.npy", "tickers.npy")
+
+
+def store_dir(csv_path):
+    return os.path.splitext(csv_path)[0] + ".mat"
+
+
+def store_files(csv_path):
+    return [os.path.join(store_dir(csv_path), f) for f in FILES]
+
+
+def is_fresh(csv_path):
+    """True si existe el almacén binario y no es más antiguo que el CSV."""
+    files = store_files(csv_path)
+    if not all(os.path.exists(f) for f in files):
+        return False
+    csv_mtime = os.stat(csv_path).st_mtime_ns
+    return all(os.stat(f).st_mtime_ns >= csv_mtime for f in files)
+
+
+def build_matrix_store(csv_path, dtype="float64"):
+    """Convierte un CSV fecha x activo en su almacén binario. Devuelve la carpeta."""
+    df = pd.read_csv(csv_path)
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values("date")
+    tickers = [c for c in df.columns if c != "date"]
+    out = store_dir(csv_path)
+    tmp = out + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "values.npy"), np.ascontiguousarray(df[tickers].to_numpy(dtype=dtype)))
+    np.save(os.path.join(tmp, "dates.npy"), df["date"].to_numpy(dtype="datetime64[ns]"))
+    np.save(os.path.join(tmp, "tickers.npy"), np.array(tickers, dtype=str))
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+    return out
+
+
+class MatrixStore:
+    """Matriz fecha x activo abierta con memory mapping (solo lectura)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.values = np.load(os.path.join(path, "values.npy"), mmap_mode="r")
+        self.dates = np.load(os.path.join(path, "dates.npy"), mmap_mode="r")
+        self.tickers = [str(t) for t in np.load(os.path.join(path, "tickers.npy"))]
+        self._col = {t: j for j, t in enumerate(self.tickers)}
+
+    def row_slice(self, start=None, end=None):
+        """Slice de filas para el rango de fechas [start, end] (búsqueda binaria)."""
+        i = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), "ns"), side="left")
+        j = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end), "ns"), side="right")
+        return slice(int(i), int(j))
+
+    def rows(self, start=None, end=None):
+        """(fechas, valores) del rango, ambos vistas sin copia."""
+        s = self.row_slice(start, end)
+        return self.dates[s], self.values[s]
+
+    def to_frame(self, start=None, end=None, columns=None):
+        """
+        DataFrame con columna 'date' + activos. Sin `columns` el bloque numérico
+        es una vista de la matriz; con `columns` solo se copian esas columnas.
+        """
+        dates, values = self.rows(start, end)
+        if columns is None:
+            names = self.tickers
+        else:
+            names = list(columns)
+            values = values[:, [self._col[c] for c in names]]
+        df = pd.DataFrame(values, columns=names, copy=False)
+        df.insert(0, "date", pd.DatetimeIndex(np.asarray(dates)))
+        return df
+
+
+if __name__ == "__main__":
+    dtype = "float32" if "--float32" in sys.argv else "float64"
+    for csv_path in [a for a in sys.argv[1:] if not a.startswith("--")]:
+        print(f"Escrito {build_matrix_store(csv_path, dtype)}")
@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+from dataclasses import dataclass, asdict
+from src.utils.alignment import align_frames, master_calendar, paired_returns
 
 def get_last_value(df, col="portfolio_value"):
     """Devuelve el último valor de la cartera (o columna especificada)."""
@@ -20,9 +22,8 @@ def get_cumulative_return_series(df, col="portfolio_value"):
 
 def get_var(returns, alpha=0.05):
     """Value at Risk (VaR) al 5% sobre una Serie de retornos diarios."""
-    import numpy as np
     returns = pd.Series(returns).dropna()
-    return np.percentile(returns, 100 * alpha)
+    return _var_from(returns.to_numpy(dtype=float), alpha)
 
 
 # --- KPIs por activo ---
@@ -30,10 +31,17 @@ def get_best_and_worst_asset(df, value_col="asset_value", asset_col="asset"):
     """
     Devuelve el nombre y return del mejor y peor activo (según rentabilidad total).
     Espera un df con columnas 'asset', 'date', 'asset_value'.
+    Primer y último valor de cada activo por posición (sin groupby.apply).
     """
-    res = {}
-    grouped = df.groupby(asset_col)
-    returns = grouped.apply(lambda x: x[value_col].iloc[-1] / x[value_col].iloc[0] - 1)
+    codes, assets = pd.factorize(df[asset_col], sort=True)
+    values = df[value_col].to_numpy(dtype=float)
+    valid = codes >= 0
+    codes, values = codes[valid], values[valid]
+    order = np.argsort(codes, kind="stable")
+    codes, values = codes[order], values[order]
+    first = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    last = np.r_[first[1:] - 1, len(codes) - 1]
+    returns = pd.Series(values[last] / values[first] - 1, index=assets)
     best = returns.idxmax()
     worst = returns.idxmin()
     return {
@@ -43,50 +51,75 @@ def get_best_and_worst_asset(df, value_col="asset_value", asset_col="asset"):
         "worst_return": returns.loc[worst],
     }
 
+def get_asset_table(df_prices, df_alloc=None, cutoff=None, periods_per_year=252):
+    """
+    Rentabilidad total y anualizada, volatilidad, max drawdown y peso actual de
+    todos los activos de la matriz de precios ('date' + una columna por activo)
+    en una sola pasada vectorizada. El peso es el de la última fila de df_alloc
+    hasta `cutoff` (NaN si el activo no está en la matriz de pesos).
+    Los huecos (NaN) se ignoran activo a activo.
+    """
+    tickers = [c for c in df_prices.columns if c != "date"]
+    P = df_prices[tickers].to_numpy(dtype=float)
+    T, N = P.shape
+    cols = np.arange(N)
+    valid = ~np.isnan(P)
+    first = P[valid.argmax(axis=0), cols]
+    last = P[T - 1 - valid[::-1].argmax(axis=0), cols]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = last / first - 1
+        # Retornos con los huecos a 0 (operaciones in-place sobre la misma matriz)
+        R = P[1:] / P[:-1]
+        R -= 1
+        gaps = np.isnan(R)
+        n = R.shape[0] - gaps.sum(axis=0)
+        R[gaps] = 0.0
+        annualized = (last / first) ** (periods_per_year / n) - 1
+        R -= R.sum(axis=0) / n
+        R[gaps] = 0.0
+        volatility = np.sqrt(np.einsum("ij,ij->j", R, R) / (n - 1) * periods_per_year)
+        peak = np.fmax.accumulate(P, axis=0)
+        np.divide(P, peak, out=peak)
+        max_dd = np.nanmin(peak, axis=0) - 1
+
+    weight = np.full(N, np.nan)
+    if df_alloc is not None:
+        alloc = df_alloc if cutoff is None else df_alloc[df_alloc["date"] <= cutoff]
+        if len(alloc):
+            last_alloc = alloc.sort_values("date").iloc[-1]
+            weight = last_alloc.reindex(tickers).to_numpy(dtype=float)
+
+    return pd.DataFrame({
+        "total_return": total_return,
+        "annualized_return": annualized,
+        "volatility": volatility,
+        "max_drawdown": max_dd,
+        "weight": weight,
+    }, index=pd.Index(tickers, name="asset"))
+
 
 def get_annualized_return(df, col="portfolio_value", periods_per_year=252):
     """Annualized Return"""
-    returns = get_daily_returns(df, col)
-    n = returns.shape[0]
-    total_ret = df[col].iloc[-1] / df[col].iloc[0]
-    return total_ret ** (periods_per_year / n) - 1
+    return _annualized_from(df[col].to_numpy(dtype=float), _returns_array(df, col), periods_per_year)
 
 def get_sharpe_ratio(df, col="portfolio_value", rf=0.0, periods_per_year=252):
     """Sharpe Ratio anualizado (asume retornos diarios, rf anualizado)"""
-    returns = get_daily_returns(df, col)
-    excess = returns - (rf / periods_per_year)
-    return np.sqrt(periods_per_year) * excess.mean() / excess.std(ddof=1)
+    return _sharpe_from(_returns_array(df, col), rf, periods_per_year)
 
 def get_sortino_ratio(df, col="portfolio_value", rf=0.0, periods_per_year=252):
     """Sortino Ratio anualizado"""
-    returns = get_daily_returns(df, col)
-    excess = returns - (rf / periods_per_year)
-    downside = excess[excess < 0]
-    denom = np.sqrt((downside ** 2).mean())
-    if denom == 0:
-        return np.nan
-    return np.sqrt(periods_per_year) * excess.mean() / denom
+    return _sortino_from(_returns_array(df, col), rf, periods_per_year)
 
 def get_max_drawdown(df, col="portfolio_value"):
     """Máximo Drawdown"""
-    series = df[col].cummax()
-    drawdown = df[col] / series - 1
-    return drawdown.min()
+    return _max_drawdown_from(df[col].to_numpy(dtype=float))
 
 def get_alpha_beta(df_portfolio, df_bench, col_port="portfolio_value", col_bench="value"):
     """
-    Alpha y Beta de la cartera frente a un benchmark.
-    Espera dos dataframes con fechas alineadas.
+    Alpha y Beta de la cartera frente a un benchmark. Los retornos se alinean
+    por fecha sobre el calendario de la cartera (ver alignment.paired_returns).
     """
-    ret_port = get_daily_returns(df_portfolio, col_port)
-    ret_bench = get_daily_returns(df_bench, col_bench)
-    min_len = min(len(ret_port), len(ret_bench))
-    ret_port = ret_port[-min_len:]
-    ret_bench = ret_bench[-min_len:]
-    cov = np.cov(ret_port, ret_bench)
-    beta = cov[0, 1] / cov[1, 1]
-    alpha = ret_port.mean() - beta * ret_bench.mean()
-    return alpha * 252, beta  # anualiza el alpha
+    return _alpha_beta_from(*paired_returns(df_portfolio, col_port, df_bench, col_bench))
 
 def get_turnover(df_alloc, fecha_corte):
     """
@@ -114,20 +147,194 @@ def get_effective_n(weights):
 
 def get_kpis(df, col="portfolio_value", rf=0.0, periods_per_year=252):
     """Devuelve todos los KPIs principales en un dict."""
+    kpis = compute_kpis(df, col, rf, periods_per_year)
     return {
-        "total_return": get_total_return(df, col),
-        "annualized_return": get_annualized_return(df, col, periods_per_year),
-        "sharpe": get_sharpe_ratio(df, col, rf, periods_per_year),
-        "sortino": get_sortino_ratio(df, col, rf, periods_per_year),
-        "max_drawdown": get_max_drawdown(df, col),
-        "var": get_var(get_daily_returns(df, col)),
+        "total_return": kpis.total_return,
+        "annualized_return": kpis.annualized_return,
+        "sharpe": kpis.sharpe,
+        "sortino": kpis.sortino,
+        "max_drawdown": kpis.max_drawdown,
+        "var": kpis.var,
     }
 
-def get_transaction_table(df_alloc, df_prices):
+# --- Motor de KPIs ---
+# Los KPIs se derivan de un único vector de retornos (y de la serie de valores
+# para rentabilidad total y drawdown). Las funciones get_* de arriba son
+# envoltorios sobre estas mismas primitivas.
+
+@dataclass(frozen=True)
+class KPIResult:
+    total_return: float
+    annualized_return: float
+    volatility: float
+    sharpe: float
+    sortino: float
+    max_drawdown: float
+    var: float
+    alpha: float = None
+    beta: float = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _returns_array(df, col):
+    return get_daily_returns(df, col).to_numpy(dtype=float)
+
+def _annualized_from(values, returns, periods_per_year=252):
+    n = returns.shape[0]
+    total_ret = values[-1] / values[0]
+    return total_ret ** (periods_per_year / n) - 1
+
+def _sharpe_from(returns, rf=0.0, periods_per_year=252):
+    excess = returns - (rf / periods_per_year)
+    return np.sqrt(periods_per_year) * excess.mean() / excess.std(ddof=1)
+
+def _sortino_from(returns, rf=0.0, periods_per_year=252):
+    excess = returns - (rf / periods_per_year)
+    downside = excess[excess < 0]
+    if downside.size == 0:
+        return np.nan
+    denom = np.sqrt((downside ** 2).mean())
+    if denom == 0:
+        return np.nan
+    return np.sqrt(periods_per_year) * excess.mean() / denom
+
+def _max_drawdown_from(values):
+    peak = np.fmax.accumulate(values)
+    return np.nanmin(values / peak - 1)
+
+def _var_from(returns, alpha=0.05):
+    return np.percentile(returns, 100 * alpha)
+
+def _alpha_beta_from(ret_port, ret_bench, periods_per_year=252):
+    min_len = min(len(ret_port), len(ret_bench))
+    ret_port = ret_port[len(ret_port) - min_len:]
+    ret_bench = ret_bench[len(ret_bench) - min_len:]
+    cov = np.cov(ret_port, ret_bench)
+    beta = cov[0, 1] / cov[1, 1]
+    alpha = ret_port.mean() - beta * ret_bench.mean()
+    return alpha * periods_per_year, beta  # anualiza el alpha
+
+def compute_kpis(df, col="portfolio_value", rf=0.0, periods_per_year=252, df_bench=None, col_bench="value", alpha=0.05):
+    """
+    Calcula todos los KPIs de una serie en una sola pasada sobre su vector de retornos.
+    Si se pasa df_bench, incluye alpha y beta frente a ese benchmark.
+    """
+    values = df[col].to_numpy(dtype=float)
+    returns = _returns_array(df, col)
+    excess = returns - (rf / periods_per_year)
+    mean_excess = excess.mean()
+    std = excess.std(ddof=1)
+    downside = excess[excess < 0]
+    denom = np.sqrt((downside ** 2).mean()) if downside.size else 0.0
+    a, b = (None, None)
+    if df_bench is not None:
+        a, b = _alpha_beta_from(*paired_returns(df, col, df_bench, col_bench), periods_per_year)
+    return KPIResult(
+        total_return=values[-1] / values[0] - 1,
+        annualized_return=_annualized_from(values, returns, periods_per_year),
+        volatility=std * np.sqrt(periods_per_year),
+        sharpe=np.sqrt(periods_per_year) * mean_excess / std,
+        sortino=np.sqrt(periods_per_year) * mean_excess / denom if denom != 0 else np.nan,
+        max_drawdown=_max_drawdown_from(values),
+        var=_var_from(returns, alpha),
+        alpha=a,
+        beta=b,
+    )
+
+# --- KPIs en lote: cartera + N benchmarks ---
+
+def build_value_matrix(df_portfolio, benchmarks, col_port="portfolio_value", col_bench="value", name="Cartera"):
+    """
+    Matriz fechas x series (cartera + benchmarks) sobre el calendario de la
+    cartera: un único join por fecha, con los valores de cada benchmark
+    rellenados hacia delante en sus huecos (ver alignment.align_frames).
+    """
+    frames = {name: (df_portfolio, col_port)}
+    for nombre, df_bench in benchmarks.items():
+        if col_bench in df_bench.columns:
+            frames[nombre] = (df_bench, col_bench)
+    return align_frames(frames, calendar=master_calendar(df_portfolio["date"]))
+
+def compute_kpis_matrix(values, rf=0.0, periods_per_year=252, bench=None, alpha=0.05):
+    """
+    KPIs de todas las columnas de una matriz de valores alineada por fecha en
+    una sola llamada vectorizada. `bench` es la columna frente a la que se
+    calculan alpha y beta. Devuelve un DataFrame serie x KPI (campos de KPIResult).
+    Los huecos (NaN) se ignoran columna a columna.
+    """
+    V = np.asarray(values, dtype=float)
+    if V.ndim == 1:
+        V = V[:, None]
+    T = V.shape[0]
+    R = V[1:] / V[:-1] - 1
+    valid_r = ~np.isnan(R)
+    n = valid_r.sum(axis=0)
+
+    valid_v = ~np.isnan(V)
+    first = V[valid_v.argmax(axis=0), np.arange(V.shape[1])]
+    last = V[T - 1 - valid_v[::-1].argmax(axis=0), np.arange(V.shape[1])]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = last / first - 1
+        annualized = (last / first) ** (periods_per_year / n) - 1
+
+        excess = R - (rf / periods_per_year)
+        mean_excess = np.nanmean(excess, axis=0)
+        std = np.sqrt(np.nansum((excess - mean_excess) ** 2, axis=0) / (n - 1))
+        sharpe = np.sqrt(periods_per_year) * mean_excess / std
+
+        down = np.where(excess < 0, excess, 0.0)
+        n_down = (excess < 0).sum(axis=0)
+        denom = np.sqrt((down ** 2).sum(axis=0) / n_down)
+        sortino = np.where(denom > 0, np.sqrt(periods_per_year) * mean_excess / denom, np.nan)
+
+        peak = np.fmax.accumulate(V, axis=0)
+        max_dd = np.nanmin(V / peak - 1, axis=0)
+
+        var = np.nanpercentile(R, 100 * alpha, axis=0)
+
+        alphas = np.full(V.shape[1], np.nan)
+        betas = np.full(V.shape[1], np.nan)
+        if bench is not None:
+            j = list(values.columns).index(bench)
+            rb = R[:, [j]]
+            both = valid_r & ~np.isnan(rb)
+            k = both.sum(axis=0)
+            x = np.where(both, R, 0.0)
+            y = np.where(both, rb, 0.0)
+            mx = x.sum(axis=0) / k
+            my = y.sum(axis=0) / k
+            cov_xy = ((x - mx) * (y - my) * both).sum(axis=0)
+            var_y = (((y - my) * both) ** 2).sum(axis=0)
+            betas = cov_xy / var_y
+            alphas = (mx - betas * my) * periods_per_year
+
+    return pd.DataFrame({
+        "total_return": total_return,
+        "annualized_return": annualized,
+        "volatility": std * np.sqrt(periods_per_year),
+        "sharpe": sharpe,
+        "sortino": sortino,
+        "max_drawdown": max_dd,
+        "var": var,
+        "alpha": alphas,
+        "beta": betas,
+    }, index=getattr(values, "columns", None))
+
+def get_compound_returns(returns):
+    """Rentabilidad compuesta (1 + r).prod() - 1 de cada columna de una matriz de retornos."""
+    R = np.asarray(returns, dtype=float)
+    return np.nanprod(1 + R, axis=0) - 1
+
+def get_transaction_table(df_alloc, df_prices, threshold=1e-5):
     """
     Para cada cambio de peso en un activo, genera una fila de transacción.
     El cambio se supone realizado al cierre del día anterior,
     y la rentabilidad de la operación se calcula entre el cierre de T-1 y el cierre de T.
+    Vectorizado: diferencia de la matriz de pesos, máscara de cambios > threshold
+    y precios de entrada/salida por reindexado de la matriz de precios desplazada.
     """
     df_alloc = df_alloc.copy()
     df_prices = df_prices.copy()
@@ -138,35 +345,40 @@ def get_transaction_table(df_alloc, df_prices):
     df_prices = df_prices.sort_values('date').set_index('date')
 
     activos = [col for col in df_alloc.columns if col != 'CASH']  # CASH no es operable
-    df_trans = []
-
-    for i in range(1, len(df_alloc)):
-        date = df_alloc.index[i]
-        prev_date = df_alloc.index[i-1]
-        prev = df_alloc.iloc[i-1]
-        curr = df_alloc.iloc[i]
-        for asset in activos:
-            change = curr[asset] - prev[asset]
-            if abs(change) > 1e-5:
-                action = "Compra" if change > 0 else "Venta"
-                # Precios de cierre anterior y actual
-                try:
-                    price_entry = df_prices.loc[prev_date, asset]
-                    price_exit = df_prices.loc[date, asset]
-                    ret_op = (price_exit - price_entry) / price_entry if price_entry != 0 else None
-                except Exception:
-                    price_entry = price_exit = ret_op = None
-                df_trans.append({
-                    "fecha": date,
-                    "activo": asset,
-                    "acción": action,
-                    "cambio_peso": change,
-                    "precio_entrada": price_entry,
-                    "precio_salida": price_exit,
-                    "retorno_op": ret_op
-                })
-    df_trans = pd.DataFrame(df_trans)
-    return df_trans
+    columnas = ["fecha", "activo", "acción", "cambio_peso", "precio_entrada", "precio_salida", "retorno_op"]
+    if len(df_alloc) < 2 or not activos:
+        return pd.DataFrame(columns=columnas)
+
+    pesos = df_alloc[activos].to_numpy(dtype=float)
+    cambios = pesos[1:] - pesos[:-1]
+    filas, cols = np.nonzero(np.abs(cambios) > threshold)  # orden fecha -> activo
+    if len(filas) == 0:
+        return pd.DataFrame(columns=columnas)
+
+    # Precios alineados con las fechas de asignación (NaN si falta fecha o activo)
+    fechas = df_alloc.index
+    precios = df_prices[~df_prices.index.duplicated(keep='last')].reindex(index=fechas, columns=activos)
+    precios = precios.to_numpy(dtype=float)
+    entrada = precios[:-1][filas, cols]
+    salida = precios[1:][filas, cols]
+    # Si falta la fecha de entrada o la de salida no hay precios de la operación
+    con_precio = fechas.isin(df_prices.index)
+    sin_precio = ~(con_precio[:-1][filas] & con_precio[1:][filas])
+    entrada[sin_precio] = np.nan
+    salida[sin_precio] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ret_op = np.where(entrada != 0, (salida - entrada) / entrada, np.nan)
+
+    cambio = cambios[filas, cols]
+    return pd.DataFrame({
+        "fecha": fechas[1:][filas],
+        "activo": np.asarray(activos, dtype=object)[cols],
+        "acción": np.where(cambio > 0, "Compra", "Venta").astype(object),
+        "cambio_peso": cambio,
+        "precio_entrada": entrada,
+        "precio_salida": salida,
+        "retorno_op": ret_op,
+    })
 
 def get_cash_series(df_alloc):
     df_alloc = df_alloc.copy()
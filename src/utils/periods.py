@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+# --- Índice de periodos sobre un histórico ordenado por fecha ---
+# Los periodos del selector ("últimos n días hasta la fecha de corte") son
+# siempre un rango contiguo de filas. Los offsets se calculan una vez con
+# búsqueda binaria y cada cambio de periodo es un slice posicional: una vista
+# sobre los mismos arrays, sin filtrar ni copiar.
+
+
+class PeriodIndex:
+    def __init__(self, df, cutoff, periods=()):
+        if not df["date"].is_monotonic_increasing:
+            df = df.sort_values("date", kind="stable")
+        self.df = df
+        dates = df["date"].to_numpy(dtype="datetime64[ns]")
+        self.end = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(cutoff), "ns"), side="right"))
+        self.starts = {n: self._start(n) for n in periods}
+
+    def _start(self, n_dias):
+        # n_dias=None es el histórico completo hasta la fecha de corte
+        return 0 if n_dias is None else max(self.end - n_dias, 0)
+
+    def slice(self, n_dias):
+        """Filas de los últimos n_dias hasta la fecha de corte (vista sin copia)."""
+        start = self.starts[n_dias] if n_dias in self.starts else self._start(n_dias)
+        return self.df.iloc[start:self.end]
+
+
+def build_period_indexes(df_portfolio, benchmarks, cutoff, periods):
+    """PeriodIndex de la cartera y de cada benchmark (dict nombre -> PeriodIndex)."""
+    return (
+        PeriodIndex(df_portfolio, cutoff, periods),
+        {nombre: PeriodIndex(df, cutoff, periods) for nombre, df in benchmarks.items()},
+    )
@@ -0,0 +1,216 @@
+"""
+Instrumentación por etapas de las vistas del dashboard.
+
+Cada ejecución del script (rerun) de una vista es una muestra: tiempo total y
+tiempo de cada etapa (carga de datos, métricas, figura, plotly_chart...).
+Opcionalmente, con tracemalloc, también la memoria reservada en cada etapa.
+tracemalloc es global al proceso: se arranca con la primera ejecución que lo
+pide y se detiene cuando termina la última (registro de hilos bajo lock), así
+que una sesión no corta las mediciones de otra. Los hilos de script que ya
+terminaron sin cerrar su ejecución (rerun interrumpido) se descartan del
+registro, de modo que tracemalloc no queda activo para siempre. Mientras está activo las reservas de
+memoria son más lentas para todos los usuarios y las cifras incluyen lo que
+reserven a la vez otras sesiones.
+Si no hay ninguna ejecución en curso, stage() no hace nada, de modo que las
+vistas pueden quedar instrumentadas sin coste cuando el panel está apagado.
+
+Las muestras se guardan en memoria (las últimas MAX_SAMPLES del proceso) para
+calcular percentiles móviles y se pueden exportar como JSON lines.
+"""
+import json
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+MAX_SAMPLES = 500
+PERCENTILES = (50, 90, 99)
+
+SAMPLES = deque(maxlen=MAX_SAMPLES)
+_SAMPLES_LOCK = threading.Lock()
+# Hilos con una ejecución en curso que usa tracemalloc (se detiene al vaciarse)
+_TRACE_LOCK = threading.Lock()
+_trace_threads = set()
+_trace_started = False
+# Cada sesión de Streamlit ejecuta su script en su propio hilo
+_local = threading.local()
+
+
+def _prune_dead_threads():
+    # Cada rerun de Streamlit corre en un hilo nuevo: uno muerto no va a cerrar su ejecución
+    _trace_threads.difference_update([t for t in _trace_threads if not t.is_alive()])
+
+
+def _acquire_tracing():
+    global _trace_started
+    with _TRACE_LOCK:
+        _prune_dead_threads()
+        if not _trace_threads and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _trace_started = True
+        _trace_threads.add(threading.current_thread())
+
+
+def _release_tracing():
+    global _trace_started
+    with _TRACE_LOCK:
+        _trace_threads.discard(threading.current_thread())
+        _prune_dead_threads()
+        # Solo se detiene si lo arrancó este módulo (no, p.ej., con -X tracemalloc)
+        if not _trace_threads and _trace_started:
+            tracemalloc.stop()
+            _trace_started = False
+
+
+def start_run(view, trace_alloc=False):
+    """Abre la muestra de un rerun de `view`. Con trace_alloc se mide también la memoria."""
+    end_run()  # una ejecución anterior interrumpida libera su uso de tracemalloc
+    if trace_alloc:
+        _acquire_tracing()
+    _local.run = {
+        "ts": pd.Timestamp.now().isoformat(timespec="milliseconds"),
+        "view": view,
+        "stages": {},
+        "t0": time.perf_counter(),
+        "trace_alloc": trace_alloc,
+        "open": [],  # pila de etapas abiertas (para los picos anidados)
+    }
+
+
+def end_run():
+    """
+    Cierra la muestra en curso, la guarda y la devuelve (None si no había).
+    Aunque este hilo no tenga ejecución, libera el uso de tracemalloc de las
+    ejecuciones interrumpidas.
+    """
+    run = getattr(_local, "run", None)
+    if run is None or run["trace_alloc"]:
+        _release_tracing()
+    if run is None:
+        return None
+    _local.run = None
+    sample = {
+        "ts": run["ts"],
+        "view": run["view"],
+        "total": time.perf_counter() - run["t0"],
+        "stages": run["stages"],
+    }
+    with _SAMPLES_LOCK:
+        SAMPLES.append(sample)
+    return sample
+
+
+@contextmanager
+def stage(name):
+    """Mide el bloque como etapa `name` de la ejecución en curso (se acumula si se repite)."""
+    run = getattr(_local, "run", None)
+    if run is None:
+        yield
+        return
+    tracing = run["trace_alloc"] and tracemalloc.is_tracing()
+    if tracing:
+        # El pico de tracemalloc es uno solo: antes de reiniciarlo para esta
+        # etapa se acumula en la etapa que la contiene, que al cerrar toma el
+        # máximo entre sus hijas y lo medido después de ellas
+        current, peak = tracemalloc.get_traced_memory()
+        if run["open"]:
+            run["open"][-1]["peak"] = max(run["open"][-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        frame = {"mem0": current, "peak": current}
+        run["open"].append(frame)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = run["stages"].setdefault(name, {"seconds": 0.0, "calls": 0})
+        entry["seconds"] += time.perf_counter() - t0
+        entry["calls"] += 1
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            run["open"].pop()
+            peak = max(frame["peak"], peak)
+            if run["open"]:
+                run["open"][-1]["peak"] = max(run["open"][-1]["peak"], peak)
+            entry["alloc_bytes"] = entry.get("alloc_bytes", 0) + current - frame["mem0"]
+            entry["peak_bytes"] = max(entry.get("peak_bytes", 0), peak - frame["mem0"])
+
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart medido como etapa 'plotly_chart' (serialización y envío)."""
+    kwargs.setdefault("use_container_width", True)
+    with stage("plotly_chart"):
+        return st.plotly_chart(fig, **kwargs)
+
+
+def get_samples(view=None):
+    with _SAMPLES_LOCK:
+        samples = list(SAMPLES)
+    return [s for s in samples if view is None or s["view"] == view]
+
+
+def stage_percentiles(view=None):
+    """DataFrame etapa x (n, p50, p90, p99) en milisegundos sobre las muestras guardadas."""
+    samples = get_samples(view)
+    per_stage = {"total": [s["total"] for s in samples]}
+    for s in samples:
+        for name, entry in s["stages"].items():
+            per_stage.setdefault(name, []).append(entry["seconds"])
+    rows = {}
+    for name, values in per_stage.items():
+        if not values:
+            continue
+        ms = np.asarray(values) * 1000
+        rows[name] = {"n": len(ms), **{f"p{p}": np.percentile(ms, p) for p in PERCENTILES}}
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def to_jsonl(samples):
+    return "\n".join(json.dumps(s, ensure_ascii=False) for s in samples) + ("\n" if samples else "")
+
+
+def export_jsonl(path, view=None):
+    """Añade las muestras guardadas a `path` en formato JSON lines. Devuelve cuántas."""
+    samples = get_samples(view)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(to_jsonl(samples))
+    return len(samples)
+
+
+# --- Panel lateral ---
+def show_panel(sample, view, import_times=None):
+    """
+    Desglose del último rerun y percentiles móviles de la vista, en la barra
+    lateral. `import_times` (vista -> segundos, ver registry.IMPORT_TIMES)
+    añade lo que tardó la primera importación de cada vista en el proceso.
+    """
+    with st.sidebar.expander("⏱️ Rendimiento", expanded=True):
+        if sample is not None:
+            st.markdown(f"**Último rerun:** {sample['total'] * 1000:.1f} ms")
+            rows = []
+            for name, entry in sample["stages"].items():
+                row = {"Etapa": name, "ms": round(entry["seconds"] * 1000, 1), "llamadas": entry["calls"]}
+                if "alloc_bytes" in entry:
+                    row["MB reservados"] = round(entry["alloc_bytes"] / 2**20, 2)
+                    row["MB pico"] = round(entry["peak_bytes"] / 2**20, 2)
+                rows.append(row)
+            if rows:
+                st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        pct = stage_percentiles(view)
+        if not pct.empty:
+            st.markdown(f"**Percentiles (ms), últimos {int(pct['n'].max())} reruns**")
+            st.dataframe(pct.round(1), use_container_width=True)
+        if import_times:
+            st.markdown("**Primera importación de cada vista (ms)**")
+            st.dataframe(
+                pd.DataFrame({"Vista": list(import_times), "ms": [round(t * 1000, 1) for t in import_times.values()]}),
+                hide_index=True, use_container_width=True,
+            )
+        st.download_button(
+            "Exportar muestras (JSON lines)", to_jsonl(get_samples()),
+            file_name="perf_samples.jsonl", mime="application/jsonl",
+        )
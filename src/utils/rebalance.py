@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# --- Motor de rebalanceo (what-if) ---
+# Dados los pesos actuales, uno o varios objetivos candidatos, los precios y el
+# valor de la cartera, calcula para cada candidato las operaciones (importe y
+# número de acciones), el turnover, el coste estimado y los pesos resultantes.
+# Todo se evalúa a la vez sobre una matriz candidatos x activos, sin bucles por
+# activo ni por candidato. CASH no se opera: recibe el neto de las compras y
+# ventas y paga los costes.
+
+COST_BPS = 10.0   # coste por operación, en puntos básicos del importe
+CASH = "CASH"
+
+
+@dataclass(frozen=True)
+class RebalanceResult:
+    candidates: pd.Index
+    assets: pd.Index
+    current: np.ndarray        # (n,) pesos actuales
+    targets: np.ndarray        # (k, n) pesos objetivo
+    prices: np.ndarray         # (n,) NaN si no hay precio
+    trade_value: np.ndarray    # (k, n) importe comprado (+) o vendido (-)
+    shares: np.ndarray         # (k, n) acciones (NaN sin precio)
+    new_weights: np.ndarray    # (k, n) pesos tras operar y pagar costes
+    turnover: np.ndarray       # (k,) importe operado / valor de la cartera
+    cost: np.ndarray           # (k,) coste estimado
+    cash_after: np.ndarray     # (k,) liquidez tras operar (negativa = faltaría liquidez)
+
+    def summary(self):
+        """Una fila por candidato: turnover, coste, nº de operaciones, liquidez y desviación frente al objetivo."""
+        return pd.DataFrame({
+            "turnover": self.turnover,
+            "cost": self.cost,
+            "n_trades": (self.trade_value != 0).sum(axis=1),
+            "cash_after": self.cash_after,
+            "tracking": np.abs(self.new_weights - self.targets).sum(axis=1) / 2,
+        }, index=self.candidates)
+
+    def trades(self, candidate=None):
+        """Lista de operaciones (solo activos con importe distinto de 0) de un candidato."""
+        i = 0 if candidate is None else self.candidates.get_loc(candidate)
+        value = self.trade_value[i]
+        mask = value != 0
+        return pd.DataFrame({
+            "asset": self.assets[mask],
+            "action": np.where(value[mask] > 0, "Compra", "Venta").astype(object),
+            "current_weight": self.current[mask],
+            "target_weight": self.targets[i, mask],
+            "new_weight": self.new_weights[i, mask],
+            "trade_value": value[mask],
+            "shares": self.shares[i, mask],
+            "price": self.prices[mask],
+        })
+
+
+def prices_at(df_prices, date, assets):
+    """Último precio conocido de cada activo en `date` (NaN si no tiene)."""
+    if not df_prices["date"].is_monotonic_increasing:
+        df_prices = df_prices.sort_values("date")
+    n = int(df_prices["date"].searchsorted(pd.Timestamp(date), side="right"))
+    tickers = df_prices.columns.drop("date")
+    if n == 0:
+        return pd.Series(np.nan, index=tickers).reindex(assets)
+    V = df_prices[tickers].to_numpy(dtype=float)[:n]
+    # Fila del último precio válido de cada columna, sin rellenar toda la matriz
+    valid = ~np.isnan(V)
+    rows = len(V) - 1 - np.argmax(valid[::-1], axis=0)
+    last = np.where(valid.any(axis=0), V[rows, np.arange(V.shape[1])], np.nan)
+    return pd.Series(last, index=tickers).reindex(assets)
+
+
+def rebalance(current, targets, prices, portfolio_value, cost_bps=COST_BPS, whole_shares=False, cash=CASH):
+    """
+    Rebalanceo de `current` (Serie de pesos por activo) hacia `targets` (Serie,
+    o DataFrame con un candidato por fila y activos en columnas; los activos
+    ausentes pesan 0). `prices` es una Serie de precios por activo. Con
+    whole_shares las operaciones se redondean a acciones enteras hacia cero y
+    los activos sin precio no se operan; el resto queda en liquidez.
+    """
+    if isinstance(targets, pd.Series):
+        targets = targets.to_frame().T
+    assets = current.index.union(targets.columns, sort=False)
+    cur = current.reindex(assets).fillna(0.0).to_numpy(dtype=float)
+    tgt = targets.reindex(columns=assets).fillna(0.0).to_numpy(dtype=float)
+    price = prices.reindex(assets).to_numpy(dtype=float)
+    is_cash = (assets == cash)
+    has_price = np.isfinite(price) & (price > 0)
+    value = float(portfolio_value)
+
+    delta = value * (tgt - cur)
+    delta[:, is_cash] = 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.where(has_price, delta / price, np.nan)
+    if whole_shares:
+        delta[:, ~has_price] = 0.0
+        shares = np.where(has_price, np.trunc(np.nan_to_num(shares)), 0.0)
+        delta = np.where(has_price, shares * price, 0.0)
+    shares[:, is_cash] = np.nan
+
+    traded = np.abs(delta).sum(axis=1)
+    cost = traded * cost_bps / 1e4
+    holdings = value * cur + delta
+    cash_after = value * cur[is_cash].sum() - delta.sum(axis=1) - cost
+    if is_cash.any():
+        holdings[:, is_cash] = 0.0
+        holdings[:, np.flatnonzero(is_cash)[0]] = cash_after
+    else:
+        # Sin columna de liquidez: el residuo (redondeo, costes) queda fuera de los pesos
+        cash_after = (value - cost) - holdings.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        new_weights = holdings / (value - cost)[:, None]
+
+    return RebalanceResult(
+        candidates=pd.Index(targets.index), assets=pd.Index(assets), current=cur, targets=tgt,
+        prices=price, trade_value=delta, shares=shares, new_weights=new_weights,
+        turnover=traded / value if value else np.full(len(tgt), np.nan), cost=cost, cash_after=cash_after,
+    )
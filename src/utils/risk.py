@@ -0,0 +1,121 @@
+import threading
+
+import numpy as np
+
+# --- Motor de VaR / CVaR a horizonte por simulación ---
+# Escalar el VaR diario por sqrt(h) supone retornos normales e independientes;
+# aquí la distribución del retorno a h días se simula directamente:
+# - "bootstrap": block bootstrap de los retornos diarios históricos (bloques de
+#   BLOCK días consecutivos, conserva la autocorrelación y las colas).
+# - "normal": Monte Carlo paramétrico sobre los log-retornos (media y varianza
+#   muestrales escaladas a h días).
+# Los retornos se acumulan en escala logarítmica con sumas acumuladas, de modo
+# que cada bloque cuesta dos lecturas y la memoria es O(caminos x bloques), no
+# O(caminos x días). Los caminos se procesan en lotes de BATCH.
+
+N_PATHS = 200_000
+BLOCK = 5
+BATCH = 50_000
+SEED = 42
+
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+_CACHE_MAX = 128
+
+
+def _log_returns(returns):
+    r = np.asarray(returns, dtype=float)
+    r = r[~np.isnan(r)]
+    if r.size < 2:
+        raise ValueError("Se necesitan al menos 2 retornos para simular")
+    return np.log1p(r)
+
+
+def block_bootstrap(returns, horizon, n_paths=N_PATHS, block=BLOCK, seed=SEED):
+    """Retornos simples a `horizon` días de n_paths caminos por block bootstrap."""
+    logr = _log_returns(returns)
+    T = logr.size
+    block = max(1, min(block, T, horizon))
+    csum = np.concatenate(([0.0], np.cumsum(logr)))
+    n_blocks = -(-horizon // block)
+    last = horizon - (n_blocks - 1) * block  # longitud del último bloque
+    lengths = np.full(n_blocks, block)
+    lengths[-1] = last
+    rng = np.random.default_rng(seed)
+    out = np.empty(n_paths)
+    for i in range(0, n_paths, BATCH):
+        n = min(BATCH, n_paths - i)
+        starts = rng.integers(0, T - block + 1, size=(n, n_blocks))
+        out[i:i + n] = (csum[starts + lengths] - csum[starts]).sum(axis=1)
+    return np.expm1(out)
+
+
+def normal_paths(returns, horizon, n_paths=N_PATHS, seed=SEED):
+    """Retornos simples a `horizon` días con log-retornos normales i.i.d."""
+    logr = _log_returns(returns)
+    mu, sigma = logr.mean(), logr.std(ddof=1)
+    rng = np.random.default_rng(seed)
+    return np.expm1(rng.normal(mu * horizon, sigma * np.sqrt(horizon), size=n_paths))
+
+
+def simulate_horizon_returns(returns, horizon, n_paths=N_PATHS, method="bootstrap", block=BLOCK, seed=SEED):
+    """
+    Distribución simulada del retorno a `horizon` días. Con horizon=1 y
+    bootstrap la distribución es la propia muestra histórica, sin simular.
+    """
+    if method == "bootstrap":
+        if horizon == 1:
+            r = np.asarray(returns, dtype=float)
+            return r[~np.isnan(r)]
+        return block_bootstrap(returns, horizon, n_paths, block, seed)
+    if method == "normal":
+        return normal_paths(returns, horizon, n_paths, seed)
+    raise ValueError(f"Método de simulación desconocido: {method}")
+
+
+def portfolio_returns_from_assets(df_prices, weights):
+    """
+    Retornos diarios históricos de la cartera con los pesos actuales fijos
+    (rebalanceo diario a esos pesos). Cada día usa los retornos conjuntos de
+    todos los activos de esa fecha, así el bootstrap conserva sus
+    correlaciones. Los pesos sin columna de precios (CASH) rinden 0.
+    """
+    tickers = [c for c in df_prices.columns if c != "date"]
+    w = weights.astype(float).reindex(tickers).fillna(0.0).to_numpy()
+    P = df_prices[tickers].to_numpy(dtype=float)
+    R = P[1:] / P[:-1] - 1
+    return np.where(np.isnan(R), 0.0, R) @ w
+
+
+def var_cvar(sim_returns, confidence=0.95):
+    """VaR y CVaR (pérdidas, positivas) de una muestra de retornos al nivel `confidence`."""
+    sim_returns = np.asarray(sim_returns, dtype=float)
+    q = np.percentile(sim_returns, 100 * (1 - confidence))
+    tail = sim_returns[sim_returns <= q]
+    return -q, -tail.mean()
+
+
+def horizon_var_cvar(returns, horizon, confidence=0.95, key=None, method="bootstrap",
+                     n_paths=N_PATHS, block=BLOCK, seed=SEED):
+    """
+    (VaR, CVaR) a `horizon` días. `returns` puede ser el array de retornos
+    diarios o una función que lo devuelve (solo se llama si no hay caché).
+    `key` identifica los datos de entrada (p.ej. fecha de corte + versión de
+    datos + origen); si se indica, el resultado se cachea por (key, horizonte,
+    confianza, método, caminos, bloque, semilla).
+    """
+    cache_key = None
+    if key is not None:
+        cache_key = (key, horizon, confidence, method, n_paths, block, seed)
+        with _CACHE_LOCK:
+            if cache_key in _CACHE:
+                return _CACHE[cache_key]
+    if callable(returns):
+        returns = returns()
+    result = var_cvar(simulate_horizon_returns(returns, horizon, n_paths, method, block, seed), confidence)
+    if cache_key is not None:
+        with _CACHE_LOCK:
+            if len(_CACHE) >= _CACHE_MAX:
+                _CACHE.pop(next(iter(_CACHE)))
+            _CACHE[cache_key] = result
+    return result
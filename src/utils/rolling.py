@@ -0,0 +1,116 @@
+import pandas as pd
+import numpy as np
+
+# --- Métricas móviles en tiempo lineal ---
+# Cada ventana se resuelve con diferencias de sumas acumuladas (S[t] - S[t-w]),
+# así el coste es O(n) por serie y ventana, sea cual sea el tamaño de la ventana.
+# Los NaN se ignoran: cada ventana usa solo sus observaciones válidas, y como
+# en pandas (min_periods=window por defecto) las ventanas con menos de
+# min_periods observaciones válidas dan NaN.
+
+
+def _window_sum(x, window):
+    """Suma móvil de x (sin NaN) sobre `window` observaciones; las primeras window-1 suman lo que hay."""
+    c = np.concatenate(([0.0], np.cumsum(x)))
+    start = np.maximum(np.arange(1, len(x) + 1) - window, 0)
+    return c[1:] - c[start]
+
+
+def _min_periods(out, n, window, min_periods):
+    """NaN donde la ventana tiene menos de min_periods (por defecto window) observaciones válidas."""
+    required = window if min_periods is None else min_periods
+    return np.where(n >= required, out, np.nan)
+
+
+def _moments(x, window):
+    # Centra la serie para evitar cancelación numérica en sum(x^2) - sum(x)^2/n
+    valid = ~np.isnan(x)
+    center = np.nanmean(x) if valid.any() else 0.0
+    xc = np.where(valid, x - center, 0.0)
+    n = _window_sum(valid.astype(float), window)
+    s1 = _window_sum(xc, window)
+    s2 = _window_sum(xc ** 2, window)
+    return n, s1, s2, center
+
+
+def rolling_mean(x, window, min_periods=None):
+    n, s1, _, center = _moments(np.asarray(x, dtype=float), window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return _min_periods(s1 / n + center, n, window, min_periods)
+
+
+def rolling_std(x, window, min_periods=None):
+    """Desviación típica móvil (ddof=1)."""
+    n, s1, s2, _ = _moments(np.asarray(x, dtype=float), window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (s2 - s1 ** 2 / n) / (n - 1)
+    return _min_periods(np.sqrt(np.maximum(var, 0.0)), n, window, min_periods)
+
+
+def rolling_volatility(returns, window, periods_per_year=252, min_periods=None):
+    """Volatilidad anualizada móvil."""
+    return rolling_std(returns, window, min_periods) * np.sqrt(periods_per_year)
+
+
+def rolling_sharpe(returns, window, rf=0.0, periods_per_year=252, min_periods=None):
+    """Sharpe anualizado móvil (misma definición que metrics.get_sharpe_ratio)."""
+    excess = np.asarray(returns, dtype=float) - rf / periods_per_year
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.sqrt(periods_per_year) * rolling_mean(excess, window, min_periods) / rolling_std(excess, window, min_periods)
+
+
+def rolling_sortino(returns, window, rf=0.0, periods_per_year=252, min_periods=None):
+    """Sortino anualizado móvil (misma definición que metrics.get_sortino_ratio)."""
+    excess = np.asarray(returns, dtype=float) - rf / periods_per_year
+    neg = np.nan_to_num(excess, nan=0.0) < 0
+    down2 = _window_sum(np.where(neg, excess, 0.0) ** 2, window)
+    n_down = _window_sum(neg.astype(float), window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denom = np.sqrt(down2 / n_down)
+        out = np.sqrt(periods_per_year) * rolling_mean(excess, window, min_periods) / denom
+    return np.where(denom > 0, out, np.nan)
+
+
+def rolling_beta(ret_port, ret_bench, window, min_periods=None):
+    """Beta móvil de ret_port frente a ret_bench (pares con ambos valores válidos)."""
+    x = np.asarray(ret_port, dtype=float)
+    y = np.asarray(ret_bench, dtype=float)
+    both = ~np.isnan(x) & ~np.isnan(y)
+    mx, my = (x[both].mean(), y[both].mean()) if both.any() else (0.0, 0.0)
+    xc = np.where(both, x - mx, 0.0)
+    yc = np.where(both, y - my, 0.0)
+    n = _window_sum(both.astype(float), window)
+    sx = _window_sum(xc, window)
+    sy = _window_sum(yc, window)
+    sxy = _window_sum(xc * yc, window)
+    syy = _window_sum(yc ** 2, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return _min_periods((sxy - sx * sy / n) / (syy - sy ** 2 / n), n, window, min_periods)
+
+
+def running_drawdown(values):
+    """Drawdown respecto al máximo alcanzado hasta cada fecha."""
+    v = np.asarray(values, dtype=float)
+    return v / np.fmax.accumulate(v) - 1
+
+
+def get_rolling_metrics(values, window, col="Cartera", bench=None, rf=0.0, periods_per_year=252, min_periods=None):
+    """
+    Series temporales de Sharpe, Sortino, volatilidad, beta (vs `bench`) y
+    drawdown de la columna `col` de una matriz de valores indexada por fecha
+    (ver metrics.build_value_matrix). Las ventanas con menos de min_periods
+    retornos válidos (por defecto la ventana completa) quedan en NaN.
+    """
+    v = values[col].to_numpy(dtype=float)
+    r = np.concatenate(([np.nan], v[1:] / v[:-1] - 1))
+    out = {
+        "Sharpe": rolling_sharpe(r, window, rf, periods_per_year, min_periods),
+        "Sortino": rolling_sortino(r, window, rf, periods_per_year, min_periods),
+        "Volatilidad": rolling_volatility(r, window, periods_per_year, min_periods),
+        "Drawdown": running_drawdown(v),
+    }
+    if bench is not None and bench in values.columns:
+        b = values[bench].to_numpy(dtype=float)
+        rb = np.concatenate(([np.nan], b[1:] / b[:-1] - 1))
+        out["Beta"] = rolling_beta(r, rb, window, min_periods)
+    return pd.DataFrame(out, index=values.index)
@@ -0,0 +1,160 @@
+"""
+Ingesta de trazas de episodios RL (info_env*.json) a los CSV del dashboard.
+
+Lee la traza en streaming, registro a registro, y escribe en una sola pasada
+asset_allocation.csv, asset_prices.csv y portfolio_history.csv con memoria
+acotada (un registro + un bloque de lectura), sea cual sea el tamaño del
+fichero. Reproduce el formato que generaba notebooks/pruebas.ipynb:
+
+- pesos: una fila por registro (CASH + activos) con 'action'.
+- precios: el primer registro aporta dos filas (pre_c el día anterior y post_c
+  en su fecha); el resto, post_c en su fecha.
+- histórico: date, portfolio_value.
+El último registro puede venir envuelto en 'final_info' y con los arrays como
+texto ("[0.1 0.2\\n 0.3]").
+
+Uso:
+    python -m src.utils.trace_ingest TRAZA.json [--out CARPETA] [--tickers CASH,AAPL,...]
+"""
+import argparse
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+
+# Universo por defecto (mismo orden que las acciones del agente; CASH primero)
+TICKERS = [
+    "CASH",
+    "AAPL", "MSFT", "NVDA", "ADBE", "CSCO",  # Tecnología
+    "AMZN", "F", "MCD",                      # Consumo Discrecional
+    "PG", "KO", "WMT",                       # Consumo Básico
+    "JNJ", "PFE", "MRK",                     # Salud
+    "JPM", "BAC", "GS",                      # Finanzas
+    "XOM", "CVX", "COP",                     # Energía
+    "GE", "MMM", "CAT",                      # Industriales
+    "GOOGL", "IBM", "NFLX",                  # Comunicación
+    "NEE", "AMT", "NUE",                     # Inmobiliario / Utilities / Materiales
+]
+
+
+def iter_records(path, chunk_size=1 << 16):
+    """Genera uno a uno los elementos del array JSON de nivel superior de `path`."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            # Salta espacios y separadores entre registros
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if not started and pos < len(buf):
+                if buf[pos] != "[":
+                    raise ValueError("La traza debe ser un array JSON")
+                started = True
+                pos += 1
+                continue
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                if pos >= len(buf):
+                    raise json.JSONDecodeError("buffer vacío", buf, pos)
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    if buf[pos:].strip():
+                        raise
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield record
+            pos = end
+
+
+def _as_list(raw):
+    if isinstance(raw, str):
+        return [float(x) for x in raw.strip().strip("[]").split()]
+    return list(raw)
+
+
+def _check(values, expected, what, date):
+    if len(values) != expected:
+        raise ValueError(f"{date}: {len(values)} {what} pero {expected} tickers")
+    return values
+
+
+def ingest_trace(trace_path, out_dir, tickers=TICKERS):
+    """
+    Convierte la traza en los tres CSV del dashboard dentro de out_dir.
+    Los ficheros se escriben a un temporal y se sustituyen al final, de modo que
+    los lectores nunca ven un CSV a medias. Devuelve el número de registros.
+    """
+    assets = tickers[1:]  # los precios no incluyen CASH
+    targets = {
+        "alloc": os.path.join(out_dir, "asset_allocation.csv"),
+        "prices": os.path.join(out_dir, "asset_prices.csv"),
+        "history": os.path.join(out_dir, "portfolio_history.csv"),
+    }
+    files = {k: open(p + ".tmp", "w", newline="") for k, p in targets.items()}
+    n = 0
+    try:
+        w_alloc = csv.writer(files["alloc"], lineterminator="\n")
+        w_prices = csv.writer(files["prices"], lineterminator="\n")
+        w_hist = csv.writer(files["history"], lineterminator="\n")
+        w_alloc.writerow(["date"] + list(tickers))
+        w_prices.writerow(["date"] + list(assets))
+        w_hist.writerow(["date", "portfolio_value"])
+
+        for i, e in enumerate(iter_records(trace_path)):
+            info = e if "date" in e else e.get("final_info", {})
+            fecha = info.get("date")
+            if fecha is None:
+                raise ValueError(f"Registro {i}: no se encontró 'date' ni en final_info")
+
+            pesos = _check(_as_list(info.get("action", [])), len(tickers), "pesos", fecha)
+            w_alloc.writerow([fecha] + pesos)
+
+            if i == 0:
+                fecha_pre = (datetime.strptime(fecha, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+                pre = _check(_as_list(info.get("pre_c", [])), len(assets), "precios", fecha_pre)
+                w_prices.writerow([fecha_pre] + pre)
+            post = _check(_as_list(info.get("post_c", [])), len(assets), "precios", fecha)
+            w_prices.writerow([fecha] + post)
+
+            valor = info.get("portfolio_value")
+            if valor is None:
+                raise ValueError(f"No se encontró 'portfolio_value' en la fecha {fecha}")
+            w_hist.writerow([fecha, valor])
+            n += 1
+    except BaseException:
+        for k, f in files.items():
+            f.close()
+            os.remove(targets[k] + ".tmp")
+        raise
+    for k, f in files.items():
+        f.close()
+        os.replace(targets[k] + ".tmp", targets[k])
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera los CSV del dashboard a partir de una traza de episodio RL.")
+    parser.add_argument("trace", help="Ruta al JSON de la traza (array de registros)")
+    parser.add_argument("--out", help="Carpeta de salida (por defecto, la carpeta de datos de config.py)")
+    parser.add_argument("--tickers", help="Lista de tickers separada por comas, CASH primero")
+    args = parser.parse_args(argv)
+    out_dir = args.out
+    if out_dir is None:
+        from config import WEIGHTS_PATH
+        out_dir = os.path.dirname(WEIGHTS_PATH)
+    tickers = args.tickers.split(",") if args.tickers else TICKERS
+    n = ingest_trace(args.trace, out_dir, tickers)
+    print(f"{n} registros procesados -> {out_dir}")
+
+
+if __name__ == "__main__":
+    main()